@@ -1,19 +1,17 @@
 import streamlit as st
-import requests
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import json
-import os
-import tempfile
-import speech_recognition as sr
-from pydub import AudioSegment
-from pydub.utils import make_chunks
-from groq import Groq
+import logging
 import time
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Any
 import re
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+import jobs
+import metrics
+import pipeline
+from asr import LANGUAGES
+from pipeline import RESULT_CACHE, reel_cache_key
+from fast_answers import answer_locally
+from prompting import ChatMemory
 
 # Page config
 st.set_page_config(
@@ -380,26 +378,13 @@ if 'citations' not in st.session_state:
     st.session_state.citations = []
 if 'analysis_done' not in st.session_state:
     st.session_state.analysis_done = False
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
+if 'chat_memory' not in st.session_state:
+    st.session_state.chat_memory = ChatMemory()
 
-# Configuration - FIXED: Load from environment variable
-RAPIDAPI_CONFIG = {
-    "url": "https://social-download-all-in-one.p.rapidapi.com/v1/social/autolink",
-    "headers": {
-        "x-rapidapi-key": os.getenv("RAPIDAPI_KEY", ""),
-        "x-rapidapi-host": "social-download-all-in-one.p.rapidapi.com",
-        "Content-Type": "application/json"
-    }
-}
-
-# Groq API Keys with fallback
-GROQ_API_KEYS = [
-    os.getenv("GROQ_API_KEY_1", ""),
-    os.getenv("GROQ_API_KEY_2", ""),
-    os.getenv("GROQ_API_KEY_3", "")
-]
-
-# Semantic Scholar API Key
-SEMANTIC_SCHOLAR_API_KEY = os.getenv("Semantic_Scholar_API_Key", "")
+# Seconds between status refreshes while an analysis job runs
+JOB_POLL_INTERVAL = 0.5
 
 def debug_log(message: str, data: Any = None):
     """Log debug information if debug mode is enabled"""
@@ -411,242 +396,45 @@ def debug_log(message: str, data: Any = None):
         </div>
         """, unsafe_allow_html=True)
 
+class StreamlitLogHandler(logging.Handler):
+    """Render pipeline log records into the page of the session that emitted them"""
+    
+    def emit(self, record: logging.LogRecord):
+        # Records from threads without a script context (e.g. batch runs) have no page to go to
+        if get_script_run_ctx(suppress_warning=True) is None:
+            return
+        message = record.getMessage()
+        if record.levelno >= logging.ERROR:
+            st.error(message)
+        elif record.levelno >= logging.WARNING:
+            st.warning(message)
+        elif record.levelno >= logging.INFO:
+            st.info(message)
+        else:
+            debug_log(message, getattr(record, "data", None))
+
+@st.cache_resource
+def install_pipeline_logging() -> logging.Handler:
+    """Route pipeline logs into the UI, once per process"""
+    handler = StreamlitLogHandler()
+    pipeline.logger.addHandler(handler)
+    pipeline.logger.setLevel(logging.DEBUG)
+    return handler
+
+install_pipeline_logging()
+metrics.start_exporters()
+
 def reset_app():
     """Reset the entire app state"""
     st.session_state.chat_history = []
+    st.session_state.chat_memory = ChatMemory()
     st.session_state.context = {}
     st.session_state.citations = []
     st.session_state.analysis_done = False
     st.session_state.api_response = None
+    st.session_state.job_id = None  # a running job still finishes and fills the result cache
     st.rerun()
 
-def get_groq_client() -> Tuple[Groq, int]:
-    """Get Groq client with fallback mechanism"""
-    for idx, api_key in enumerate(GROQ_API_KEYS):
-        if api_key:
-            try:
-                client = Groq(api_key=api_key)
-                # Test the client
-                client.models.list()
-                debug_log(f"✅ Successfully connected with API Key #{idx + 1}")
-                return client, idx
-            except Exception as e:
-                debug_log(f"❌ API Key {idx + 1} failed", {"error": str(e)})
-                st.warning(f"⚠️ API Key {idx + 1} failed, trying next...")
-                continue
-    raise Exception("All Groq API keys failed!")
-
-def transcribe_audio(audio_path: str, language: str) -> str:
-    """Transcribe audio to text in chunks"""
-    import gc
-    
-    try:
-        debug_log(f"Starting transcription for: {audio_path}", {"language": language})
-        
-        sound = AudioSegment.from_file(audio_path)
-        chunks = make_chunks(sound, 10000)  # 10 second chunks
-        r = sr.Recognizer()
-        full_transcript = []
-        
-        lang_code = 'hi-IN' if language == 'Hindi' else 'en-US'
-        debug_log(f"Total chunks to process: {len(chunks)}", {"lang_code": lang_code})
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        for i, chunk in enumerate(chunks):
-            chunk_name = None
-            try:
-                # Create temp file with unique name
-                chunk_name = f"temp_chunk_{i}_{int(time.time() * 1000)}.wav"
-                chunk.export(chunk_name, format="wav")
-                
-                # Small delay to ensure file is written
-                time.sleep(0.1)
-                
-                # Transcribe
-                with sr.AudioFile(chunk_name) as source:
-                    r.adjust_for_ambient_noise(source, duration=1)
-                    audio_data = r.record(source)
-                
-                # Explicitly close and cleanup
-                del source
-                gc.collect()
-                
-                # Recognize speech
-                text = r.recognize_google(audio_data, language=lang_code)  # type: ignore
-                full_transcript.append(text)
-                debug_log(f"Chunk {i+1} transcribed successfully", {"text": text[:50] + "..." if len(text) > 50 else text})
-                
-                progress = (i + 1) / len(chunks)
-                progress_bar.progress(progress)
-                status_text.text(f"🎙️ Transcribing... {int(progress * 100)}%")
-                
-            except sr.UnknownValueError:
-                debug_log(f"Chunk {i+1}: Speech not recognized")
-                pass
-            except sr.RequestError as e:
-                debug_log(f"Chunk {i+1}: API error", {"error": str(e)})
-                st.warning(f"⚠️ API error: {str(e)}")
-            except Exception as e:
-                debug_log(f"Chunk {i+1}: Unexpected error", {"error": str(e)})
-                pass
-            finally:
-                # Cleanup temp file with retry
-                if chunk_name and os.path.exists(chunk_name):
-                    for attempt in range(5):
-                        try:
-                            time.sleep(0.2)
-                            os.remove(chunk_name)
-                            break
-                        except PermissionError:
-                            if attempt < 4:
-                                time.sleep(0.3)
-                            else:
-                                debug_log(f"Failed to delete {chunk_name} after 5 attempts")
-                                pass
-        
-        progress_bar.empty()
-        status_text.empty()
-        
-        final_transcript = " ".join(full_transcript)
-        debug_log("Transcription completed", {"length": len(final_transcript), "preview": final_transcript[:100] + "..." if len(final_transcript) > 100 else final_transcript})
-        
-        return final_transcript
-    except Exception as e:
-        debug_log("Transcription failed", {"error": str(e)})
-        st.error(f"Transcription error: {str(e)}")
-        return ""
-
-def fetch_semantic_scholar_papers(query: str) -> List[Dict[str, Any]]:
-    """Fetch papers from Semantic Scholar API"""
-    try:
-        debug_log("Fetching papers from Semantic Scholar", {"query": query})
-        
-        headers = {}
-        if SEMANTIC_SCHOLAR_API_KEY:
-            headers["x-api-key"] = SEMANTIC_SCHOLAR_API_KEY
-            debug_log("Using Semantic Scholar API key")
-        else:
-            debug_log("No Semantic Scholar API key found - using rate-limited access")
-        
-        # Search for papers
-        search_url = "https://api.semanticscholar.org/graph/v1/paper/search"
-        params = {
-            "query": query,
-            "limit": 5,
-            "fields": "title,abstract,url,year,authors,citationCount,publicationTypes"
-        }
-        
-        response = requests.get(search_url, params=params, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            papers = data.get('data', [])
-            debug_log(f"✅ Found {len(papers)} papers from Semantic Scholar", {"papers": [p.get('title', '') for p in papers]})
-            return papers
-        else:
-            debug_log(f"❌ Semantic Scholar API error - Status: {response.status_code}", {"response": response.text[:200]})
-            return []
-            
-    except Exception as e:
-        debug_log("❌ Semantic Scholar search error", {"error": str(e), "type": type(e).__name__})
-        return []
-
-def fetch_medical_info(query: str) -> Tuple[str, List[Dict[str, str]]]:
-    """Fetch medical information from PubMed and Semantic Scholar"""
-    citations = []
-    
-    try:
-        debug_log("🔍 Starting medical info search", {"query": query})
-        
-        # PubMed search
-        st.info("🔍 Searching PubMed database...")
-        base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-        params = {
-            "db": "pubmed",
-            "term": query,
-            "retmax": 3,
-            "retmode": "json"
-        }
-        
-        response = requests.get(base_url, params=params, timeout=10)
-        pubmed_results = []
-        
-        if response.status_code == 200:
-            data = response.json()
-            pmids = data.get('esearchresult', {}).get('idlist', [])
-            debug_log("✅ PubMed search results", {"pmids": pmids, "count": len(pmids)})
-            
-            if pmids:
-                # Fetch summaries
-                summary_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
-                summary_params = {
-                    "db": "pubmed",
-                    "id": ",".join(pmids),
-                    "retmode": "json"
-                }
-                summary_response = requests.get(summary_url, params=summary_params, timeout=10)
-                if summary_response.status_code == 200:
-                    summaries = summary_response.json()
-                    for pmid in pmids:
-                        article = summaries.get('result', {}).get(pmid, {})
-                        title = article.get('title', '')
-                        if title:
-                            pubmed_url = f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/"
-                            pubmed_results.append(f"• {title}")
-                            citations.append({
-                                "title": title,
-                                "url": pubmed_url,
-                                "source": "PubMed",
-                                "id": pmid
-                            })
-                            debug_log(f"✅ Added PubMed citation: {title[:50]}...")
-                else:
-                    debug_log(f"❌ PubMed summary fetch failed - Status: {summary_response.status_code}")
-        else:
-            debug_log(f"❌ PubMed search failed - Status: {response.status_code}")
-        
-        # Semantic Scholar search
-        st.info("🔍 Searching Semantic Scholar database...")
-        semantic_papers = fetch_semantic_scholar_papers(query)
-        semantic_results = []
-        
-        for paper in semantic_papers:
-            title = paper.get('title', '')
-            url = paper.get('url', '')
-            year = paper.get('year', 'N/A')
-            if title and url:
-                semantic_results.append(f"• {title} ({year})")
-                citations.append({
-                    "title": title,
-                    "url": url,
-                    "source": "Semantic Scholar",
-                    "year": str(year)
-                })
-                debug_log(f"✅ Added Semantic Scholar citation: {title[:50]}...")
-        
-        # Combine results
-        all_results = []
-        if pubmed_results:
-            all_results.extend(pubmed_results[:2])
-        if semantic_results:
-            all_results.extend(semantic_results[:3])
-        
-        debug_log(f"📚 Total citations found: {len(citations)}", {
-            "pubmed": len(pubmed_results),
-            "semantic_scholar": len(semantic_results),
-            "total": len(citations)
-        })
-        
-        result_text = "\n".join(all_results) if all_results else "No medical references found"
-        return result_text, citations
-        
-    except Exception as e:
-        debug_log("❌ Medical search error", {"error": str(e), "type": type(e).__name__})
-        st.error(f"Medical search error: {str(e)}")
-        return f"Medical search error: {str(e)}", citations
-
 def format_analysis_with_proper_markdown(text: str) -> str:
     """Fix markdown formatting - replace ** with actual bold HTML"""
     # Replace **text** with <strong>text</strong>
@@ -676,78 +464,6 @@ def format_analysis_with_proper_markdown(text: str) -> str:
     
     return '\n'.join(formatted_lines)
 
-def analyze_with_llm(caption: str, transcript: str) -> Tuple[str, List[Dict[str, str]]]:
-    """Analyze content with Groq LLM and return formatted analysis with citations"""
-    try:
-        client, key_idx = get_groq_client()
-        st.info(f"🤖 Using Groq API Key #{key_idx + 1}")
-        
-        # Fetch medical context from both sources
-        with st.spinner("🔍 Searching medical databases for scientific references..."):
-            medical_context, citations = fetch_medical_info(transcript[:300])
-        
-        # Save citations to session state immediately
-        st.session_state.citations = citations
-        debug_log(f"💾 Saved {len(citations)} citations to session state")
-        
-        if citations:
-            st.success(f"✅ Found {len(citations)} scientific references!")
-        else:
-            st.warning("⚠️ No scientific references found. Analysis will be based on general medical knowledge.")
-        
-        prompt = f"""You are a Gen-Z medical fact-checker with a sense of humor. Analyze this Instagram Reel content:
-
-**Caption:** {caption}
-
-**Transcript:** {transcript}
-
-**Scientific References Found:**
-{medical_context}
-
-Your task:
-1. **What's the claim?** - Summarize what they're saying (max 2 lines)
-2. **Is it legit?** ✅❌ - Rate accuracy (Accurate/Partially True/Misleading/False)
-3. **The tea ☕** - Explain what's actually true with scientific backing
-4. **Red flags 🚩** - Point out anything sus or incorrect
-5. **Bottom line** - Your verdict in one spicy sentence
-
-Keep it:
-- In bullet points
-- Easy to read
-- Funny but factual
-- Gen-Z friendly (use emojis!)
-- Backed by science
-
-IMPORTANT: Do NOT use ** for bold text. The system will handle formatting.
-
-Be brutally honest but helpful. If something's wrong, say it. If it's right, give credit."""
-
-        debug_log("📤 Sending request to Groq LLM", {"prompt_length": len(prompt)})
-        
-        with st.spinner("🧠 AI is analyzing the medical claims..."):
-            response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": "You are a medical fact-checker who speaks like a Gen-Z doctor. Be accurate, funny, and use emojis. Write without markdown formatting."},
-                    {"role": "user", "content": prompt}
-                ],  # type: ignore
-                temperature=0.7,
-                max_tokens=2048
-            )
-        
-        result = response.choices[0].message.content or "Analysis not available"
-        debug_log("✅ LLM analysis completed", {"length": len(result), "preview": result[:100]})
-        
-        # Format the result with proper HTML
-        formatted_result = format_analysis_with_proper_markdown(result)
-        
-        return formatted_result, citations
-        
-    except Exception as e:
-        debug_log("❌ LLM analysis failed", {"error": str(e), "type": type(e).__name__})
-        st.error(f"❌ LLM Analysis failed: {str(e)}")
-        return "Analysis failed. Please try again.", []
-
 def display_citations(citations: List[Dict[str, str]]):
     """Display citations in a prominent, beautiful format - FIXED VERSION"""
     if not citations:
@@ -804,95 +520,140 @@ def display_citations(citations: List[Dict[str, str]]):
         "citations": [{"title": c.get('title', '')[:50], "source": c.get('source', '')} for c in citations]
     })
 
+def display_result_section(title: str, content: str):
+    """Display one titled result card"""
+    st.markdown(f"""
+    <div class="result-section">
+        <h2 class="result-title">{title}</h2>
+        <div class="result-content">{content}</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+def display_download_buttons(caption: str, transcript: str, analysis: str, citations: List[Dict[str, str]]):
+    """Display download buttons in a responsive grid"""
+    st.markdown("### 📥 Download Results")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.download_button(
+            "📄 Caption",
+            caption,
+            file_name="caption.txt",
+            mime="text/plain",
+            use_container_width=True
+        )
+    
+    with col2:
+        st.download_button(
+            "📜 Transcript",
+            transcript,
+            file_name="transcript.txt",
+            mime="text/plain",
+            use_container_width=True
+        )
+    
+    with col3:
+        # Prepare analysis text without HTML for download
+        analysis_text = re.sub(r'<[^>]+>', '', analysis)
+        
+        # Add citations to download
+        if citations:
+            analysis_text += "\n\n" + "="*50 + "\n"
+            analysis_text += "SCIENTIFIC REFERENCES & CITATIONS\n"
+            analysis_text += "="*50 + "\n\n"
+            for i, cite in enumerate(citations, 1):
+                analysis_text += f"[{i}] {cite.get('title', '')}\n"
+                analysis_text += f"    Source: {cite.get('source', '')}\n"
+                analysis_text += f"    URL: {cite.get('url', '')}\n"
+                if cite.get('year'):
+                    analysis_text += f"    Year: {cite.get('year')}\n"
+                analysis_text += "\n"
+        
+        st.download_button(
+            "📊 Full Report",
+            analysis_text,
+            file_name="medical_analysis_report.txt",
+            mime="text/plain",
+            use_container_width=True
+        )
+
+def render_job_logs(job: jobs.Job):
+    """Replay the pipeline messages recorded on a job"""
+    for level, message, data in job.logs:
+        if level >= logging.ERROR:
+            st.error(message)
+        elif level >= logging.WARNING:
+            st.warning(message)
+        elif level >= logging.INFO:
+            st.info(message)
+        else:
+            debug_log(message, data)
+
+def display_job_progress(job: jobs.Job):
+    """Render a job's partial results and current stage"""
+    render_job_logs(job)
+    
+    if "caption" in job.result:
+        display_result_section("📝 Caption", job.result["caption"])
+    if "transcript" in job.result:
+        display_result_section(f"📜 Transcript ({job.language})", job.result["transcript"])
+    if "citations" in job.result:
+        if job.result["citations"]:
+            st.success(f"✅ Found {len(job.result['citations'])} scientific references!")
+        else:
+            st.warning("⚠️ No scientific references found. Analysis will be based on general medical knowledge.")
+    
+    if job.stage == "transcribe":
+        st.progress(job.progress, text=f"🎙️ Transcribing... {int(job.progress * 100)}%")
+    elif job.stage == "analysis" and job.partial_analysis:
+        display_result_section("🔬 Medical Analysis", format_analysis_with_proper_markdown(job.partial_analysis + " ▌"))
+
+def finish_analysis(result: Dict[str, Any], language: str):
+    """Move a finished analysis into session state, where the results section picks it up"""
+    st.session_state.context = {**result, 'language': language}
+    st.session_state.citations = result['citations']
+    st.session_state.analysis_done = True
+
+def display_results(result: Dict[str, Any]):
+    """Display a finished analysis with its citations and downloads"""
+    analysis = format_analysis_with_proper_markdown(result['analysis'])
+    
+    display_result_section("📝 Caption", result['caption'])
+    display_result_section(f"📜 Transcript ({result.get('language', '')})", result['transcript'])
+    display_result_section("🔬 Medical Analysis", analysis)
+    
+    st.markdown("---")
+    display_citations(result['citations'])
+    st.markdown("---")
+    
+    display_download_buttons(result['caption'], result['transcript'], analysis, result['citations'])
+
 def chat_with_context(user_question: str) -> str:
-    """Chat with context of the analyzed reel"""
+    """Chat with context of the analyzed reel, streaming the reply into an assistant bubble"""
+    # Questions about the sources or verdict are answered from what's already stored
+    local_answer = answer_locally(user_question, st.session_state.context, st.session_state.citations)
+    if local_answer:
+        debug_log("⚡ Answered from stored analysis", {"question": user_question})
+        return local_answer
+    
+    reply_placeholder = st.empty()
+    
+    def render_partial(text: str):
+        reply_placeholder.markdown(f'<div class="assistant-message">🤖 {text} ▌</div>', unsafe_allow_html=True)
+    
     try:
-        client, _ = get_groq_client()
-        
-        # Include citations in context
-        citations_text = ""
-        if st.session_state.citations:
-            citations_text = "\n\nAvailable Scientific Sources:\n"
-            for i, cite in enumerate(st.session_state.citations, 1):
-                citations_text += f"[{i}] {cite.get('title', '')} - {cite.get('source', '')} - {cite.get('url', '')}\n"
-        
-        context_info = f"""
-        Reel Caption: {st.session_state.context.get('caption', 'N/A')}
-        Transcript: {st.session_state.context.get('transcript', 'N/A')}
-        Analysis: {st.session_state.context.get('analysis', 'N/A')}
-        {citations_text}
-        """
-        
-        debug_log("💬 Chat request", {"question": user_question})
-        
-        messages = [
-            {"role": "system", "content": f"You are a helpful medical assistant. You have context about an Instagram Reel:\n{context_info}\n\nAnswer questions based on this context. Be friendly, accurate, and use emojis. When answering about sources or citations, ALWAYS provide the specific URLs from the citations above."}
-        ]
-        
-        # Add chat history
-        for msg in st.session_state.chat_history[-10:]:
-            messages.append({"role": msg["role"], "content": msg["content"]})  # type: ignore
-        
-        messages.append({"role": "user", "content": user_question})
-        
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,  # type: ignore
-            temperature=0.7,
-            max_tokens=1024
+        return pipeline.chat_with_context(
+            user_question,
+            st.session_state.context,
+            st.session_state.citations,
+            st.session_state.chat_history,
+            render_partial,
+            st.session_state.chat_memory
         )
-        
-        result = response.choices[0].message.content or ""
-        debug_log("✅ Chat response received", {"length": len(result)})
-        
-        return result
-        
     except Exception as e:
         debug_log("❌ Chat error", {"error": str(e)})
         return f"Chat error: {str(e)}"
 
-def extract_audio_url(data: Dict[str, Any]) -> str:
-    """Extract audio URL from API response with multiple fallback strategies"""
-    debug_log("Extracting audio URL from response", data)
-    
-    # Strategy 1: Check medias array
-    if 'medias' in data and isinstance(data['medias'], list):
-        debug_log(f"Found 'medias' array with {len(data['medias'])} items")
-        
-        # Try to find audio in medias
-        for idx, media in enumerate(data['medias']):
-            debug_log(f"Media {idx}", media)
-            
-            # Check if it's audio type
-            if isinstance(media, dict):
-                if media.get('type') == 'audio' or 'audio' in media.get('url', '').lower():
-                    debug_log(f"Found audio at index {idx}")
-                    return media['url']
-        
-        # If not found by type, try index 1 (original approach)
-        if len(data['medias']) > 1:
-            debug_log("Using medias[1] as fallback")
-            return data['medias'][1]['url']
-    
-    # Strategy 2: Check for direct audio_url field
-    if 'audio_url' in data:
-        debug_log("Found 'audio_url' field")
-        return data['audio_url']
-    
-    # Strategy 3: Check medias dict (not array)
-    if 'medias' in data and isinstance(data['medias'], dict):
-        if 'audio' in data['medias']:
-            debug_log("Found 'medias.audio' field")
-            return data['medias']['audio']
-    
-    # Strategy 4: Look for any field containing 'audio'
-    for key, value in data.items():
-        if 'audio' in key.lower() and isinstance(value, str) and value.startswith('http'):
-            debug_log(f"Found audio URL in field: {key}")
-            return value
-    
-    raise KeyError(f"Could not find audio URL in response. Available keys: {list(data.keys())}")
-
 # Main App
 st.markdown("""
 <div class="title-container">
@@ -923,187 +684,68 @@ with col1:
         "📱 Paste Instagram Reel URL",
         placeholder="https://www.instagram.com/reel/...",
         label_visibility="collapsed",
-        disabled=st.session_state.analysis_done
+        disabled=st.session_state.analysis_done or bool(st.session_state.job_id)
     )
 
 with col2:
     language = st.selectbox(
         "🌐 Language",
-        ["Hindi", "English"],
+        list(LANGUAGES),
         label_visibility="collapsed",
-        disabled=st.session_state.analysis_done
+        disabled=st.session_state.analysis_done or bool(st.session_state.job_id)
     )
 
 analyze_button = st.button(
     "🔍 Analyze This Reel!", 
     use_container_width=True,
-    disabled=st.session_state.analysis_done
+    disabled=st.session_state.analysis_done or bool(st.session_state.job_id)
 )
 
-# Analysis Section
+# Analysis Section - repeat reels come straight from the result cache, new ones become background jobs
 if analyze_button and reel_url:
-    with st.spinner("🔮 Fetching reel data..."):
-        try:
-            debug_log("Fetching reel data", {"url": reel_url})
-            
-            # Fetch reel data
-            payload = {"url": reel_url}
-            response = requests.post(
-                RAPIDAPI_CONFIG["url"],
-                json=payload,
-                headers=RAPIDAPI_CONFIG["headers"]
-            )
-            
-            debug_log("API Response Status", {"status_code": response.status_code})
-            
-            data = response.json()
-            st.session_state.api_response = data  # Save for debugging
-            
-            debug_log("Full API Response", data)
-            
-            # Extract caption
-            caption = data.get('title', '') or data.get('caption', '') or data.get('description', '') or 'No Caption Found'
-            debug_log("Extracted caption", {"caption": caption})
-            
-            # Extract audio URL with fallback strategies
-            try:
-                audio_url = extract_audio_url(data)
-                debug_log("Audio URL extracted", {"url": audio_url})
-            except Exception as e:
-                st.error(f"❌ Could not find audio URL in response")
-                debug_log("Audio extraction failed", {"error": str(e)})
-                
-                # Show raw response for debugging
-                with st.expander("🔍 View Raw API Response"):
-                    st.json(data)
-                
-                st.info("💡 **Tip:** Enable Debug Mode and check the logs above to see the full API response structure.")
-                st.stop()
-            
-            # Download audio
-            debug_log("Downloading audio", {"url": audio_url})
-            audio_response = requests.get(audio_url)
-            
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_audio:
-                temp_audio.write(audio_response.content)
-                audio_path = temp_audio.name
-            
-            debug_log("Audio downloaded", {"path": audio_path, "size": len(audio_response.content)})
-            
-            st.success("✅ Reel data fetched successfully!")
-            
-            # Display caption
-            st.markdown(f"""
-            <div class="result-section">
-                <h2 class="result-title">📝 Caption</h2>
-                <div class="result-content">{caption}</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Transcribe
-            with st.spinner("🎙️ Transcribing audio..."):
-                transcript = transcribe_audio(audio_path, str(language))
-            
-            if transcript:
-                st.markdown(f"""
-                <div class="result-section">
-                    <h2 class="result-title">📜 Transcript ({language})</h2>
-                    <div class="result-content">{transcript}</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Analyze
-                with st.spinner("🧠 Analyzing with AI..."):
-                    analysis, citations = analyze_with_llm(caption, transcript)
-                
-                st.markdown(f"""
-                <div class="result-section">
-                    <h2 class="result-title">🔬 Medical Analysis</h2>
-                    <div class="result-content">{analysis}</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Display citations - PROMINENTLY - FIXED
-                st.markdown("---")
-                display_citations(citations)
-                st.markdown("---")
-                
-                # Save to session state
-                st.session_state.context = {
-                    'caption': caption,
-                    'transcript': transcript,
-                    'analysis': analysis,
-                    'audio_path': audio_path,
-                    'citations': citations
-                }
-                st.session_state.analysis_done = True
-                
-                # Download buttons - responsive grid
-                st.markdown("### 📥 Download Results")
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    st.download_button(
-                        "📄 Caption",
-                        caption,
-                        file_name="caption.txt",
-                        mime="text/plain",
-                        use_container_width=True
-                    )
-                
-                with col2:
-                    st.download_button(
-                        "📜 Transcript",
-                        transcript,
-                        file_name="transcript.txt",
-                        mime="text/plain",
-                        use_container_width=True
-                    )
-                
-                with col3:
-                    # Prepare analysis text without HTML for download
-                    analysis_text = re.sub(r'<[^>]+>', '', analysis)
-                    
-                    # Add citations to download
-                    if citations:
-                        analysis_text += "\n\n" + "="*50 + "\n"
-                        analysis_text += "SCIENTIFIC REFERENCES & CITATIONS\n"
-                        analysis_text += "="*50 + "\n\n"
-                        for i, cite in enumerate(citations, 1):
-                            analysis_text += f"[{i}] {cite.get('title', '')}\n"
-                            analysis_text += f"    Source: {cite.get('source', '')}\n"
-                            analysis_text += f"    URL: {cite.get('url', '')}\n"
-                            if cite.get('year'):
-                                analysis_text += f"    Year: {cite.get('year')}\n"
-                            analysis_text += "\n"
-                    
-                    st.download_button(
-                        "📊 Full Report",
-                        analysis_text,
-                        file_name="medical_analysis_report.txt",
-                        mime="text/plain",
-                        use_container_width=True
-                    )
-                
-            else:
-                st.error("❌ Transcription failed. Please try again.")
-            
-            # Cleanup
-            if os.path.exists(audio_path):
-                try:
-                    os.remove(audio_path)
-                    debug_log("Audio file cleaned up", {"path": audio_path})
-                except Exception as e:
-                    debug_log("Failed to cleanup audio file", {"error": str(e)})
-                
-        except Exception as e:
-            st.error(f"❌ Error: {str(e)}")
-            debug_log("Fatal error", {"error": str(e), "type": type(e).__name__})
-            
-            # Show raw response if available
-            if st.session_state.api_response:
-                with st.expander("🔍 View Raw API Response"):
-                    st.json(st.session_state.api_response)
+    cached_result = RESULT_CACHE.get(reel_cache_key(reel_url, str(language)))
+    if cached_result:
+        debug_log("⚡ Result cache hit", {"key": reel_cache_key(reel_url, str(language))})
+        st.success("⚡ This reel was analyzed recently - showing saved results!")
+        finish_analysis(cached_result, str(language))
+    else:
+        st.session_state.job_id = jobs.JOB_QUEUE.submit(reel_url, str(language)).id
+
+job = jobs.JOB_QUEUE.get(st.session_state.job_id) if st.session_state.job_id else None
+
+if st.session_state.job_id and job is None:
+    # The server restarted or the job expired before this session saw it finish
+    st.session_state.job_id = None
+    st.error("❌ This analysis is no longer available. Please try again.")
+
+elif job and job.stage == "done":
+    st.session_state.job_id = None
+    st.session_state.api_response = job.api_response
+    render_job_logs(job)
+    st.success("✅ Reel analyzed successfully!")
+    finish_analysis(job.result, job.language)
+
+elif job and job.stage == "failed":
+    st.session_state.job_id = None
+    st.session_state.api_response = job.api_response
+    display_job_progress(job)
+    st.error(f"❌ Error: {job.error}")
+    
+    # Show raw response if available
+    if job.failed_stage == "fetch" and job.api_response:
+        with st.expander("🔍 View Raw API Response"):
+            st.json(job.api_response)
+        st.info("💡 **Tip:** Enable Debug Mode and check the logs above to see the full API response structure.")
+
+elif job:
+    # Still running: show where it is, then poll again
+    display_job_progress(job)
+    with st.spinner(jobs.STAGE_LABELS[job.stage]):
+        time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
+
+if st.session_state.analysis_done and st.session_state.context:
+    display_results(st.session_state.context)
 
 # Show raw API response in debug mode
 if st.session_state.debug_mode and st.session_state.api_response:
@@ -1126,7 +768,8 @@ if st.session_state.context:
             if msg["role"] == "user":
                 st.markdown(f'<div class="user-message">👤 {msg["content"]}</div>', unsafe_allow_html=True)
             else:
-                st.markdown(f'<div class="assistant-message">🤖 {msg["content"]}</div>', unsafe_allow_html=True)
+                content = msg["content"].replace("\n", "<br>")  # keep line breaks inside the HTML bubble
+                st.markdown(f'<div class="assistant-message">🤖 {content}</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Chat input
@@ -1141,14 +784,13 @@ if st.session_state.context:
             submit = st.form_submit_button("Send 📤", use_container_width=True)
         
         if submit and user_input:
-            # Add user message
-            st.session_state.chat_history.append({"role": "user", "content": user_input})
-            
-            # Get response
+            # Get response, streamed below the question
+            st.markdown(f'<div class="user-message">👤 {user_input}</div>', unsafe_allow_html=True)
             with st.spinner("🤔 Thinking..."):
                 response = chat_with_context(user_input)
             
-            # Add assistant message
+            # Add both messages once answered, so the history sent never repeats the question
+            st.session_state.chat_history.append({"role": "user", "content": user_input})
             st.session_state.chat_history.append({"role": "assistant", "content": response})
             
             st.rerun()
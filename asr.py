@@ -0,0 +1,142 @@
+"""Speech recognition backends for pipeline.transcribe_audio.
+
+Every backend takes batches of 16 kHz mono 16-bit PCM segments (as
+sr.AudioData) and returns one transcript per segment, "" where no speech
+was recognized. Select one with ASR_BACKEND:
+
+* google  - the free Google Web Speech endpoint, one request per segment
+* whisper - faster-whisper running locally on CPU (pip install 'faster-whisper>=1.2')
+"""
+import os
+import re
+import threading
+from typing import Any, Dict, List, Type
+
+import numpy as np
+import speech_recognition as sr
+
+# BatchedInferencePipeline takes clip_timestamps in seconds from 1.2 on
+WHISPER_REQUIREMENT = "faster-whisper>=1.2"
+
+# UI language -> BCP-47 tag; backends needing bare ISO 639-1 codes take the prefix
+LANGUAGES = {
+    "Hindi": "hi-IN",
+    "English": "en-US"
+}
+
+
+class ASRBackend:
+    """Base class: transcribes batches of segments, batch_size at a time, max_workers batches at once."""
+
+    name = ""
+    batch_size = 1
+    max_workers = 1
+
+    @property
+    def cache_id(self) -> str:
+        """Identifies the engine and model in transcript cache keys"""
+        return self.name
+
+    def recognize_batch(self, segments: List[sr.AudioData], language: str) -> List[str]:
+        raise NotImplementedError
+
+
+class GoogleBackend(ASRBackend):
+    """Google Web Speech API; segments are independent requests, so they fan out over threads."""
+
+    name = "google"
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+
+    def recognize_batch(self, segments: List[sr.AudioData], language: str) -> List[str]:
+        recognizer = sr.Recognizer()
+        texts = []
+        for audio_data in segments:
+            try:
+                texts.append(recognizer.recognize_google(audio_data, language=LANGUAGES[language]))  # type: ignore
+            except sr.UnknownValueError:
+                texts.append("")
+        return texts
+
+
+class WhisperBackend(ASRBackend):
+    """faster-whisper on CPU, decoding each batch of segments in one batched inference call.
+
+    Workers run their batches in parallel, each on its own share of the cores.
+    """
+
+    name = "whisper"
+
+    def __init__(self, model: str = "small", compute_type: str = "int8", max_workers: int = 2, batch_size: int = 4):
+        self.model = model
+        self.compute_type = compute_type
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self._model: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_id(self) -> str:
+        return f"whisper-{self.model}"
+
+    def _load_model(self) -> Any:
+        """Load the model once per process, on first use"""
+        with self._lock:
+            if self._model is None:
+                try:
+                    import faster_whisper
+                    from faster_whisper import BatchedInferencePipeline, WhisperModel
+                except ImportError as e:
+                    raise RuntimeError(f"ASR_BACKEND=whisper needs {WHISPER_REQUIREMENT}: pip install '{WHISPER_REQUIREMENT}'") from e
+                # Before 1.2, clip_timestamps were sample indices rather than seconds
+                if tuple(int(part) for part in re.findall(r"\d+", faster_whisper.__version__)[:2]) < (1, 2):
+                    raise RuntimeError(f"ASR_BACKEND=whisper needs {WHISPER_REQUIREMENT}, found {faster_whisper.__version__}: pip install -U '{WHISPER_REQUIREMENT}'")
+                self._model = BatchedInferencePipeline(model=WhisperModel(
+                    self.model,
+                    device="cpu",
+                    compute_type=self.compute_type,
+                    cpu_threads=max(1, (os.cpu_count() or 1) // self.max_workers),
+                    num_workers=self.max_workers  # lets max_workers batches decode in parallel
+                ))
+            return self._model
+
+    def recognize_batch(self, segments: List[sr.AudioData], language: str) -> List[str]:
+        """Lay the segments end to end and decode them as one batch, one clip per segment"""
+        if not segments:
+            return []
+        pipeline = self._load_model()
+        clips = [
+            np.frombuffer(audio_data.get_raw_data(convert_rate=16000, convert_width=2), dtype=np.int16).astype(np.float32) / 32768
+            for audio_data in segments
+        ]
+        ends = np.cumsum([len(clip) for clip in clips]) / 16000
+        starts = np.concatenate(([0.0], ends[:-1]))
+        parts, _ = pipeline.transcribe(
+            np.concatenate(clips),
+            language=LANGUAGES[language].split("-")[0],
+            beam_size=1,
+            vad_filter=False,  # segments are already cut on pauses
+            clip_timestamps=[{"start": float(start), "end": float(end)} for start, end in zip(starts, ends)],
+            batch_size=len(clips)
+        )
+
+        # Each decoded part belongs to the clip its midpoint falls in
+        texts: List[List[str]] = [[] for _ in clips]
+        for part in parts:
+            idx = min(int(np.searchsorted(ends, (part.start + part.end) / 2)), len(clips) - 1)
+            texts[idx].append(part.text.strip())
+        return [" ".join(text).strip() for text in texts]
+
+
+BACKENDS: Dict[str, Type[ASRBackend]] = {
+    "google": GoogleBackend,
+    "whisper": WhisperBackend
+}
+
+
+def create_backend(name: str, **options: Any) -> ASRBackend:
+    """Instantiate the backend registered under name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
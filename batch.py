@@ -0,0 +1,155 @@
+"""Headless batch mode: analyze a file of reel URLs and write one JSON record per reel.
+
+    python batch.py flagged_reels.txt --language Hindi --output results.jsonl
+
+Reels already present in the output file are skipped, so an interrupted run
+can simply be restarted with the same arguments.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Set
+
+import asr
+import metrics
+import pipeline
+
+logger = logging.getLogger("medreel.batch")
+
+# Max reels in each stage at once; stages hit different upstreams with different limits
+DEFAULT_STAGE_LIMITS = {
+    "fetch": 2,       # RapidAPI
+    "download": 4,    # media CDN
+    "transcribe": 2,  # Google Speech (each transcription already fans out per chunk)
+    "search": 2,      # PubMed + Semantic Scholar
+    "analysis": 2     # Groq
+}
+
+
+def read_urls(path: str) -> List[str]:
+    """Read reel URLs, one per line, ignoring blanks and # comments"""
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def completed_reels(output_path: str) -> Set[str]:
+    """Reel IDs that already have a record in the output file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["reel_id"])
+            except (ValueError, KeyError):
+                continue  # e.g. a line cut short by an interrupted run
+    return done
+
+
+def analyze_reel(reel_url: str, language: str, limits: Dict[str, threading.Semaphore]) -> Dict[str, Any]:
+    """Run the full pipeline for one reel and return its output record"""
+    record: Dict[str, Any] = {
+        "url": reel_url,
+        "reel_id": pipeline.normalize_reel_id(reel_url),
+        "language": language,
+        "caption": None,
+        "transcript": None,
+        "analysis": None,
+        "citations": [],
+        "timings": {},
+        "errors": []
+    }
+    stage = "fetch"
+    started = time.perf_counter()
+
+    def run_stage(name: str, fn, *args):
+        nonlocal stage
+        stage = name
+        with limits[name]:
+            stage_started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                record["timings"][name] = round(time.perf_counter() - stage_started, 3)
+
+    try:
+        data = run_stage("fetch", pipeline.fetch_reel_data, reel_url)
+        record["caption"] = pipeline.extract_caption(data)
+        audio_url = pipeline.extract_audio_url(data)
+
+        audio_path = run_stage("download", pipeline.download_audio, audio_url)
+        try:
+            record["transcript"] = run_stage("transcribe", pipeline.transcribe_audio, audio_path, language)
+        finally:
+            os.remove(audio_path)
+        if not record["transcript"]:
+            raise ValueError("No speech recognized in the reel audio")
+
+        medical_context, record["citations"] = run_stage("search", pipeline.fetch_medical_info, record["transcript"], record["caption"])
+        record["analysis"] = run_stage("analysis", pipeline.analyze_with_llm, record["caption"], record["transcript"], medical_context)
+    except Exception as e:
+        record["errors"].append({"stage": stage, "error": str(e), "type": type(e).__name__})
+
+    record["timings"]["total"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(urls: List[str], language: str, output_path: str, workers: int, stage_limits: Dict[str, int]) -> int:
+    """Analyze every URL not yet in output_path; returns the number of reels processed"""
+    done = completed_reels(output_path)
+    pending = []
+    for url in urls:
+        reel_id = pipeline.normalize_reel_id(url)
+        if reel_id not in done:
+            done.add(reel_id)  # also drops duplicates within the input file
+            pending.append(url)
+    logger.info(f"{len(pending)} reels to analyze, {len(urls) - len(pending)} skipped")
+
+    limits = {name: threading.Semaphore(limit) for name, limit in stage_limits.items()}
+    write_lock = threading.Lock()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+        def process(url: str):
+            record = analyze_reel(url, language, limits)
+            with write_lock:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+            status = f"failed at {record['errors'][0]['stage']}" if record["errors"] else "ok"
+            logger.info(f"{record['reel_id']}: {status} in {record['timings']['total']}s")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(process, pending))
+
+    return len(pending)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyze a list of Instagram reel URLs to JSONL")
+    parser.add_argument("urls_file", help="text file with one reel URL per line")
+    parser.add_argument("--language", choices=list(asr.LANGUAGES), default="Hindi")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file to append records to")
+    parser.add_argument("--workers", type=int, default=4, help="reels processed at once")
+    for name, limit in DEFAULT_STAGE_LIMITS.items():
+        parser.add_argument(f"--{name}-concurrency", type=int, default=limit, help=f"max reels in the {name} stage at once")
+    parser.add_argument("--verbose", action="store_true", help="include pipeline debug logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+    metrics.start_exporters()
+    stage_limits = {name: getattr(args, f"{name}_concurrency") for name in DEFAULT_STAGE_LIMITS}
+    run_batch(read_urls(args.urls_file), args.language, args.output, args.workers, stage_limits)
+    if metrics.METRICS_FILE:
+        metrics.write_metrics_file(metrics.METRICS_FILE)
+
+
+if __name__ == "__main__":
+    main()
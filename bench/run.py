@@ -0,0 +1,167 @@
+"""Offline end-to-end benchmark of the analysis pipeline.
+
+    python -m bench.run --corpus samples/ --iterations 3
+    python -m bench.run --latency speech=1200 --error-rate speech=0.05 --json bench.json
+
+Starts the stand-in servers from bench/stubs.py, points pipeline.py at them
+and runs every reel in the corpus through batch.analyze_reel, the same code
+path as headless batch mode. Reports p50/p95 per stage and end to end.
+Without --corpus a few synthetic reels are generated.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from bench.stubs import DEFAULT_LATENCY_MS, SERVICES, FaultProfile, StandInServer
+
+AUDIO_EXTENSIONS = (".mp3", ".mp4", ".m4a", ".aac", ".wav", ".ogg", ".webm")
+
+STAGES = ("fetch", "download", "transcribe", "search", "analysis", "total")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linearly interpolated percentile, q in [0, 100]"""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    pos = (len(ordered) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def parse_service_values(items: List[str], option: str) -> Dict[str, float]:
+    """Parse SERVICE=VALUE pairs; the service 'all' applies to every stand-in"""
+    values = {}
+    for item in items:
+        service, sep, value = item.partition("=")
+        if not sep or (service != "all" and service not in SERVICES):
+            raise SystemExit(f"{option} expects SERVICE=VALUE with SERVICE in: all, {', '.join(SERVICES)}")
+        for name in (SERVICES if service == "all" else (service,)):
+            values[name] = float(value)
+    return values
+
+
+def synthesize_corpus(directory: str) -> List[str]:
+    """Write tone-and-pause clips standing in for short, medium and long reels"""
+    from pydub import AudioSegment
+    from pydub.generators import Sine
+
+    paths = []
+    for seconds in (15, 30, 60):
+        clip = AudioSegment.empty()
+        while len(clip) < seconds * 1000:
+            clip += Sine(220 + len(clip) % 7 * 40).to_audio_segment(duration=2500, volume=-12)
+            clip += AudioSegment.silent(duration=500)
+        path = os.path.join(directory, f"synthetic_{seconds}s.wav")
+        clip[:seconds * 1000].set_frame_rate(16000).export(path, format="wav")
+        paths.append(path)
+    return paths
+
+
+def load_corpus(corpus_dir: str) -> List[str]:
+    paths = sorted(
+        os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir)
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    )
+    if not paths:
+        raise SystemExit(f"No audio files ({', '.join(AUDIO_EXTENSIONS)}) found in {corpus_dir}")
+    return paths
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """p50/p95/max per stage plus error counts by stage"""
+    summary: Dict[str, Any] = {"reels": len(records), "stages": {}, "errors": {}}
+    for stage in STAGES:
+        timings = [r["timings"][stage] for r in records if stage in r["timings"]]
+        if timings:
+            summary["stages"][stage] = {
+                "n": len(timings),
+                "p50": round(percentile(timings, 50), 3),
+                "p95": round(percentile(timings, 95), 3),
+                "max": round(max(timings), 3)
+            }
+    for record in records:
+        for error in record["errors"]:
+            summary["errors"][error["stage"]] = summary["errors"].get(error["stage"], 0) + 1
+    return summary
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(f"\n{summary['reels']} reels")
+    print(f"{'stage':<12}{'n':>6}{'p50 (s)':>10}{'p95 (s)':>10}{'max (s)':>10}{'errors':>8}")
+    for stage, stats in summary["stages"].items():
+        errors = summary["errors"].get(stage, 0)
+        print(f"{stage:<12}{stats['n']:>6}{stats['p50']:>10.3f}{stats['p95']:>10.3f}{stats['max']:>10.3f}{errors:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against local stand-ins for every external service")
+    parser.add_argument("--corpus", help="directory of sample reel audio files (default: synthetic clips)")
+    parser.add_argument("--iterations", type=int, default=3, help="times each corpus file is analyzed")
+    parser.add_argument("--concurrency", type=int, default=1, help="reels analyzed at once")
+    parser.add_argument("--language", choices=["Hindi", "English"], default="English")
+    parser.add_argument("--asr-backend", choices=["google", "whisper"], default="google",
+                        help="whisper benchmarks the local engine; the speech stand-in is then unused")
+    parser.add_argument("--latency", action="append", default=[], metavar="SERVICE=MS",
+                        help="override injected latency (repeatable)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency jitter as a fraction of the latency")
+    parser.add_argument("--error-rate", action="append", default=[], metavar="SERVICE=P",
+                        help="fraction of requests answered with 503 (repeatable)")
+    parser.add_argument("--warm-caches", action="store_true",
+                        help="keep transcript and literature caches between reels instead of measuring cold runs")
+    parser.add_argument("--seed", type=int, default=0, help="seed for injected jitter and errors")
+    parser.add_argument("--json", dest="json_path", help="also write the summary and raw records here")
+    args = parser.parse_args()
+
+    latency = {**DEFAULT_LATENCY_MS, **parse_service_values(args.latency, "--latency")}
+    error_rate = parse_service_values(args.error_rate, "--error-rate")
+    faults = {
+        service: FaultProfile(latency[service], args.jitter, error_rate.get(service, 0.0))
+        for service in SERVICES
+    }
+
+    workdir = tempfile.mkdtemp(prefix="medreel_bench_")
+    paths = load_corpus(args.corpus) if args.corpus else synthesize_corpus(workdir)
+    corpus = {f"bench{i:03d}": path for i, path in enumerate(paths)}
+
+    stand_in = StandInServer(corpus, faults, seed=args.seed)
+    stand_in.start()
+
+    # pipeline reads its configuration at import time
+    os.environ.update(stand_in.env())
+    os.environ["MEDREEL_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["ASR_BACKEND"] = args.asr_backend
+    if not args.warm_caches:
+        for name in ("TRANSCRIPT", "ESEARCH", "ESUMMARY", "EFETCH", "SEMANTIC_SCHOLAR"):
+            os.environ[f"{name}_CACHE_TTL"] = "0"
+
+    import batch
+    from speech_recognition.recognizers import google
+
+    google.RequestBuilder.endpoint = stand_in.speech_endpoint
+
+    limits = {name: threading.Semaphore(limit) for name, limit in batch.DEFAULT_STAGE_LIMITS.items()}
+    urls = [f"https://www.instagram.com/reel/{shortcode}/" for shortcode in corpus] * args.iterations
+
+    print(f"Benchmarking {len(urls)} reels ({len(corpus)} files x {args.iterations}) against {stand_in.base_url}", file=sys.stderr)
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            records = list(executor.map(lambda url: batch.analyze_reel(url, args.language, limits), urls))
+    finally:
+        stand_in.stop()
+
+    summary = summarize(records)
+    print_summary(summary)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "records": records}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Local stand-ins for every service the pipeline calls, replaying recorded responses.
+
+One threaded HTTP server answers for all of them under different path
+prefixes. Each service gets its own injected latency (with jitter) and error
+rate, so slow or flaky upstreams can be simulated without network access.
+"""
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+SERVICES = ("rapidapi", "cdn", "speech", "esearch", "esummary", "efetch", "semantic_scholar", "groq")
+
+# Typical response times seen against the live services, in milliseconds
+DEFAULT_LATENCY_MS = {
+    "rapidapi": 900,
+    "cdn": 150,
+    "speech": 700,
+    "esearch": 350,
+    "esummary": 300,
+    "efetch": 400,
+    "semantic_scholar": 450,
+    "groq": 400  # time to first token; the completion then streams in
+}
+
+# Delay between streamed completion chunks, in milliseconds
+GROQ_TOKEN_INTERVAL_MS = 15
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f) if name.endswith(".json") else f.read()
+
+
+class FaultProfile:
+    """Injected latency and error rate for one service."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+
+class StandInServer:
+    """Serves recorded RapidAPI, CDN, Google Speech, E-utilities, Semantic Scholar and Groq responses.
+
+    corpus maps a reel shortcode to the audio file the CDN stand-in serves
+    for it; the RapidAPI stand-in points each reel's audio media at it.
+    """
+
+    def __init__(self, corpus: Dict[str, str], faults: Dict[str, FaultProfile], seed: Optional[int] = None):
+        self.corpus = corpus
+        self.faults = faults
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._transcripts = itertools.cycle(load_fixture("google_speech.json"))
+        self._transcripts_lock = threading.Lock()
+        self.fixtures = {
+            "rapidapi": load_fixture("rapidapi_autolink.json"),
+            "esearch": load_fixture("esearch.json"),
+            "esummary": load_fixture("esummary.json"),
+            "efetch": load_fixture("efetch.xml"),
+            "semantic_scholar": load_fixture("semantic_scholar.json"),
+            "groq": load_fixture("groq_analysis.txt"),
+            "groq_claims": load_fixture("groq_claims.json")
+        }
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment that points pipeline.py at the stand-ins (set before importing it)"""
+        return {
+            "RAPIDAPI_URL": f"{self.base_url}/rapidapi/v1/social/autolink",
+            "RAPIDAPI_KEY": "bench",
+            "PUBMED_EUTILS_URL": f"{self.base_url}/eutils",
+            "SEMANTIC_SCHOLAR_API_URL": f"{self.base_url}/s2",
+            "GROQ_BASE_URL": f"{self.base_url}/groq",
+            "GROQ_API_KEY_1": "bench",
+            "GROQ_API_KEY_2": "",
+            "GROQ_API_KEY_3": ""
+        }
+
+    @property
+    def speech_endpoint(self) -> str:
+        return f"{self.base_url}/speech-api/v2/recognize"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, name="bench-stand-ins", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def inject_fault(self, service: str) -> bool:
+        """Sleep for the service's latency; True if this request should fail"""
+        fault = self.faults.get(service) or FaultProfile()
+        with self._random_lock:
+            spread = self._random.uniform(-fault.jitter, fault.jitter)
+            fail = self._random.random() < fault.error_rate
+        if fault.latency_ms > 0:
+            time.sleep(max(0.0, fault.latency_ms * (1 + spread)) / 1000)
+        return fail
+
+    def next_transcript(self) -> str:
+        with self._transcripts_lock:
+            return next(self._transcripts)
+
+    def _make_handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def _dispatch(self, method: str):
+                url = urlparse(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                routes = [
+                    ("POST", "/rapidapi/", "rapidapi", self._rapidapi),
+                    ("GET", "/cdn/", "cdn", self._cdn),
+                    ("POST", "/speech-api/", "speech", self._speech),
+                    ("GET", "/eutils/esearch", "esearch", self._json_fixture),
+                    ("GET", "/eutils/esummary", "esummary", self._esummary),
+                    ("GET", "/eutils/efetch", "efetch", self._efetch),
+                    ("GET", "/s2/", "semantic_scholar", self._json_fixture),
+                    ("GET", "/groq/openai/v1/models", "groq", self._groq_models),
+                    ("POST", "/groq/openai/v1/chat/completions", "groq", self._groq_completion)
+                ]
+                for route_method, prefix, service, handler in routes:
+                    if method == route_method and url.path.startswith(prefix):
+                        if stand_in.inject_fault(service):
+                            self._send_json(503, {"error": {"message": f"Injected {service} failure"}})
+                        else:
+                            handler(service, url, body)
+                        return
+                self.send_error(404)
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, status: int, data):
+                self._send(status, json.dumps(data).encode(), "application/json")
+
+            def _json_fixture(self, service, url, body):
+                self._send_json(200, stand_in.fixtures[service])
+
+            def _rapidapi(self, service, url, body):
+                reel_url = json.loads(body or b"{}").get("url", "")
+                match = re.search(r"/(?:reels?|p|tv)/([A-Za-z0-9_-]+)", reel_url)
+                shortcode = match.group(1) if match else ""
+                if shortcode not in stand_in.corpus:
+                    self._send_json(200, {"error": True, "message": "Media not found"})
+                    return
+                data = json.loads(json.dumps(stand_in.fixtures[service]))
+                data["url"] = reel_url
+                for media in data["medias"]:
+                    if media.get("type") == "audio":
+                        media["url"] = f"{stand_in.base_url}/cdn/{shortcode}"
+                self._send_json(200, data)
+
+            def _cdn(self, service, url, body):
+                path = stand_in.corpus.get(url.path.rsplit("/", 1)[-1])
+                if not path:
+                    self.send_error(404)
+                    return
+                with open(path, "rb") as f:
+                    self._send(200, f.read(), "audio/mp4")
+
+            def _speech(self, service, url, body):
+                # Google answers with an empty interim result line, then the final one
+                result = {
+                    "result": [{"alternative": [{"transcript": stand_in.next_transcript(), "confidence": 0.92}], "final": True}],
+                    "result_index": 0
+                }
+                lines = json.dumps({"result": []}) + "\n" + json.dumps(result) + "\n"
+                self._send(200, lines.encode(), "application/json; charset=utf-8")
+
+            def _esummary(self, service, url, body):
+                ids = parse_qs(url.query).get("id", [""])[0].split(",")
+                recorded = stand_in.fixtures[service]["result"]
+                result = {"uids": [pmid for pmid in ids if pmid in recorded]}
+                result.update({pmid: recorded[pmid] for pmid in result["uids"]})
+                self._send_json(200, {"header": stand_in.fixtures[service]["header"], "result": result})
+
+            def _efetch(self, service, url, body):
+                ids = parse_qs(url.query).get("id", [""])[0].split(",")
+                articles = re.findall(r"<PubmedArticle>.*?</PubmedArticle>", stand_in.fixtures[service], re.S)
+                matching = [a for a in articles if re.search(r"<PMID[^>]*>(\d+)</PMID>", a).group(1) in ids]
+                xml = '<?xml version="1.0" ?>\n<PubmedArticleSet>\n' + "\n".join(matching) + "\n</PubmedArticleSet>\n"
+                self._send(200, xml.encode(), "text/xml; charset=UTF-8")
+
+            def _groq_models(self, service, url, body):
+                self._send_json(200, {
+                    "object": "list",
+                    "data": [{"id": "llama-3.3-70b-versatile", "object": "model", "created": 0, "owned_by": "bench", "active": True}]
+                })
+
+            def _groq_completion(self, service, url, body):
+                request = json.loads(body or b"{}")
+                if not request.get("stream"):
+                    # Only claim extraction asks for a whole (JSON) completion
+                    self._send_json(200, {
+                        "id": "chatcmpl-bench",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request.get("model", ""),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": json.dumps(stand_in.fixtures["groq_claims"])},
+                            "finish_reason": "stop"
+                        }],
+                        "usage": {"prompt_tokens": 200, "completion_tokens": 40, "total_tokens": 240}
+                    })
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                words = re.findall(r"\S+\s*", stand_in.fixtures[service])
+                for i, word in enumerate(words):
+                    chunk = {
+                        "id": "chatcmpl-bench",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": request.get("model", ""),
+                        "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": "stop" if i == len(words) - 1 else None}]
+                    }
+                    if i == len(words) - 1:
+                        # Groq reports usage on the last chunk; counts here are rough
+                        prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+                        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)}
+                        chunk["x_groq"] = {"id": "req_bench", "usage": usage}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(GROQ_TOKEN_INTERVAL_MS / 1000)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        return Handler
@@ -0,0 +1,147 @@
+"""Instant chat answers for questions the stored analysis already answers.
+
+"What are the sources?" and friends only need the citations and the
+verdict the analysis produced, so they are answered locally instead of
+costing a Groq call. A question is matched only when every word in it is
+either filler or a word for the same intent. "What are the sources?" is
+answered here, while "Are the sources reliable?" still goes to the LLM.
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+
+# Words that carry no intent of their own (English and common Hinglish)
+FILLER_WORDS = {
+    "a", "all", "an", "and", "any", "are", "can", "could", "do", "does", "for", "from", "give", "have",
+    "i", "in", "is", "it", "its", "list", "me", "of", "on", "please", "pls", "show", "tell", "that",
+    "the", "their", "them", "there", "these", "this", "those", "to", "used", "was", "were", "what",
+    "whats", "which", "you", "your", "reel", "video", "analysis", "claim", "claims", "again", "just",
+    "kya", "hai", "hain", "batao", "dikhao", "ke", "ka", "ki", "mujhe", "ye", "yeh", "wo", "woh",
+    "iska", "iske", "iski", "isme", "sab", "saare", "kaunse", "konse", "bata", "de", "na"
+}
+
+# Intents in match priority order, with the words that ask for them
+INTENT_WORDS = {
+    "pmids": {"pmid", "pmids", "pubmed", "id", "ids", "number", "numbers"},
+    "years": {"year", "years", "when", "published", "publication", "date", "dates", "old", "recent"},
+    "sources": {"source", "sources", "link", "links", "url", "urls", "reference", "references", "citation",
+                "citations", "paper", "papers", "study", "studies", "research", "evidence", "scientific"},
+    "verdict": {"verdict", "bottom", "line", "rating", "legit", "true", "accurate", "fake", "conclusion",
+                "tldr", "final", "overall", "sach", "jhoot"}
+}
+
+# Words too vague on their own ("What is the number?", "When?", "Is it recent?"): these
+# intents also need one of their anchor words, or a word for the sources themselves
+INTENT_ANCHORS = {
+    "pmids": {"pmid", "pmids", "pubmed"},
+    "years": {"year", "years", "published", "publication", "date", "dates"} | INTENT_WORDS["sources"]
+}
+
+# The analysis prompt's section headings, in order, as patterns
+SECTION_HEADINGS = [r"what['’]?s the claim", r"is it legit", r"the tea", r"red flags", r"bottom line"]
+
+NO_SOURCES_ANSWER = "📭 No scientific sources were found for this reel, so the analysis is based on general medical knowledge."
+
+
+def question_intent(question: str) -> Optional[str]:
+    """The intent a question asks for, or None if it's anything more than that"""
+    # Phone keyboards type curly apostrophes ("What’s the verdict?")
+    question = re.sub(r"['‘’]", "", question.lower())
+    words = set(re.findall(r"[a-z]+", question)) - FILLER_WORDS
+    if not words:
+        return None
+    for intent, intent_words in INTENT_WORDS.items():
+        # pmids and years questions may also mention sources ("when were the papers published?")
+        allowed = intent_words if intent in ("sources", "verdict") else intent_words | INTENT_WORDS["sources"]
+        if words & intent_words and words <= allowed and words & INTENT_ANCHORS.get(intent, words):
+            return intent
+    return None
+
+
+def citation_line(i: int, citation: Dict[str, str]) -> str:
+    return f"[{i}] {citation.get('title', 'Untitled')} - {citation.get('url', '')}"
+
+
+def answer_sources(context: Dict[str, Any], citations: List[Dict[str, str]]) -> Optional[str]:
+    if not citations:
+        return NO_SOURCES_ANSWER
+    lines = [citation_line(i, c) + f" ({c.get('source', '')})" for i, c in enumerate(citations, 1)]
+    return f"📚 Here are the {len(citations)} sources behind this analysis:\n" + "\n".join(lines)
+
+
+def answer_years(context: Dict[str, Any], citations: List[Dict[str, str]]) -> Optional[str]:
+    if not citations:
+        return NO_SOURCES_ANSWER
+    lines = [
+        citation_line(i, c) + f" ({c['year'] if c.get('year', 'N/A') != 'N/A' else 'year unknown'})"
+        for i, c in enumerate(citations, 1)
+    ]
+    return "📅 Publication years of the sources:\n" + "\n".join(lines)
+
+
+def answer_pmids(context: Dict[str, Any], citations: List[Dict[str, str]]) -> Optional[str]:
+    pubmed = [(i, c) for i, c in enumerate(citations, 1) if c.get('source') == "PubMed" and c.get('id')]
+    if not pubmed:
+        return "🔎 None of the sources for this reel came from PubMed, so there are no PMIDs to show."
+    lines = [f"[{i}] PMID {c['id']} - {c.get('title', 'Untitled')} - {c.get('url', '')}" for i, c in pubmed]
+    return "🧬 PubMed IDs of the sources:\n" + "\n".join(lines)
+
+
+def heading_match(line: str, heading: str) -> Optional[re.Match]:
+    """Match heading at the start of line, after any number, bullet, # or emoji prefix, capturing the rest"""
+    return re.match(r"\s*(?:\d+[.)])?\W*" + heading + r"\b[?*:\-–\s]*(.*)", line, re.I)
+
+
+def analysis_section(analysis: str, heading: str) -> Optional[str]:
+    """Text of the analysis section under heading, '' if it's missing, or None if the layout is ambiguous"""
+    lines = analysis.splitlines()
+    starts = [n for n, line in enumerate(lines) if heading_match(line, heading)]
+    if not starts:
+        return ""
+    if len(starts) > 1:
+        return None
+    n = starts[0]
+    # Drop the prompt's ✅❌ placeholder, which the model tends to copy into the heading
+    text = re.sub(r"^✅\s*❌\s*[-:–]?\s*", "", heading_match(lines[n], heading).group(1).strip())
+    # A heading on its own line (or with just the placeholder or an emoji) is followed by its bullet points
+    if not re.search(r"\w", text):
+        body = []
+        for following in lines[n + 1:]:
+            if re.match(r"\s*#", following) or any(heading_match(following, h) for h in SECTION_HEADINGS):
+                break
+            if following.strip():
+                body.append(re.sub(r"^[-*•+]\s*", "", following.strip()))
+        if not body:
+            return None
+        text = "\n".join(body)
+    return text.replace("**", "")
+
+
+def answer_verdict(context: Dict[str, Any], citations: List[Dict[str, str]]) -> Optional[str]:
+    analysis = context.get('analysis', '')
+    rating = analysis_section(analysis, SECTION_HEADINGS[1])
+    bottom_line = analysis_section(analysis, SECTION_HEADINGS[4])
+    if rating is None or bottom_line is None or not (rating or bottom_line):
+        return None  # analysis not in the usual shape: let the LLM read it
+    parts = [f"⚖️ Rating: {rating}"] if rating else []
+    if bottom_line:
+        parts.append(f"🎯 Bottom line: {bottom_line}")
+    return "\n".join(parts)
+
+
+ANSWERS: Dict[str, Callable[[Dict[str, Any], List[Dict[str, str]]], Optional[str]]] = {
+    "sources": answer_sources,
+    "years": answer_years,
+    "pmids": answer_pmids,
+    "verdict": answer_verdict
+}
+
+
+def answer_locally(question: str, context: Dict[str, Any], citations: List[Dict[str, str]]) -> Optional[str]:
+    """An answer built from the stored analysis and citations, or None to ask the LLM"""
+    intent = question_intent(question)
+    answer = ANSWERS[intent](context, citations) if intent else None
+    if answer:
+        metrics.inc("medreel_chat_local_answers_total", intent=intent)
+    return answer
@@ -0,0 +1,87 @@
+"""Process-wide pool of Groq clients with a per-key circuit breaker."""
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from groq import AuthenticationError, Groq, PermissionDeniedError, RateLimitError
+
+# Errors that mean the key itself is unusable right now, so the next key should be tried
+KEY_FAILURE_ERRORS = (AuthenticationError, PermissionDeniedError, RateLimitError)
+
+
+class GroqClientPool:
+    """Caches one Groq client per API key and skips keys that recently failed.
+
+    A key is probed with models.list() only the first time it is used and
+    again after it fails; a failed key is left alone until its cool-down
+    expires.
+    """
+
+    def __init__(self, api_keys: List[str], cooldown: float = 60.0):
+        self.api_keys = api_keys
+        self.cooldown = cooldown
+        self._clients: List[Optional[Groq]] = [None] * len(api_keys)
+        self._verified = [False] * len(api_keys)
+        self._probing = [False] * len(api_keys)
+        self._open_until = [0.0] * len(api_keys)
+        self._lock = threading.Condition()
+
+    def acquire(self, on_failure: Optional[Callable[[int, Exception], None]] = None) -> Tuple[Groq, int]:
+        """Return the first healthy (client, key index), probing only unverified keys.
+
+        Probes run outside the lock. While one key is being probed, other
+        callers move on to the next key. They wait for the probe's result only
+        when no other key is left, and never probe the same key twice.
+        """
+        while True:
+            with self._lock:
+                idx = self._next_key()
+                if self._verified[idx]:
+                    return self._clients[idx], idx  # type: ignore
+                self._probing[idx] = True
+
+            client = Groq(api_key=self.api_keys[idx])
+            try:
+                client.models.list()
+                error = None
+            except Exception as e:
+                error = e
+
+            with self._lock:
+                self._probing[idx] = False
+                if error is None:
+                    self._clients[idx] = client
+                    self._verified[idx] = True
+                else:
+                    self._trip(idx)
+                self._lock.notify_all()
+            if error is None:
+                return client, idx
+            if on_failure:
+                on_failure(idx, error)
+
+    def _next_key(self) -> int:
+        """First key that is verified or free to probe, waiting out other threads' probes (lock held)"""
+        while True:
+            probing = False
+            for idx, api_key in enumerate(self.api_keys):
+                if not api_key or time.monotonic() < self._open_until[idx]:
+                    continue
+                if self._probing[idx]:
+                    probing = True
+                    continue
+                return idx
+            if not probing:
+                raise Exception("All Groq API keys failed!")
+            self._lock.wait()
+
+    def report_failure(self, idx: int, error: Exception) -> None:
+        """Open the breaker for a key whose request failed because of the key"""
+        if isinstance(error, KEY_FAILURE_ERRORS):
+            with self._lock:
+                self._trip(idx)
+
+    def _trip(self, idx: int) -> None:
+        self._verified[idx] = False
+        self._clients[idx] = None
+        self._open_until[idx] = time.monotonic() + self.cooldown
@@ -0,0 +1,134 @@
+"""Process-wide pooled HTTP session with consistent timeouts and retry/backoff.
+
+Every outbound requests call in the pipeline goes through here, so
+connections (and their TLS sessions) are kept alive and reused across
+reels, Streamlit sessions and batch workers instead of being re-opened per
+call.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from rate_limit import TokenBucket
+
+logger = logging.getLogger("medreel.http")
+
+# (connect, read) seconds, used unless a call passes its own timeout
+DEFAULT_TIMEOUT: Tuple[float, float] = (5, 15)
+
+HTTP_POOL_CONFIG = {
+    "hosts": 10,  # distinct hosts with a kept-alive pool
+    "connections_per_host": int(os.getenv("HTTP_CONNECTIONS_PER_HOST", "10"))  # callers wait beyond this
+}
+
+RETRY_CONFIG = {
+    "attempts": int(os.getenv("HTTP_RETRY_ATTEMPTS", "3")),  # total tries, including the first
+    "backoff": float(os.getenv("HTTP_RETRY_BACKOFF", "0.5")),  # seconds; doubles every retry
+    "max_delay": float(os.getenv("HTTP_RETRY_MAX_DELAY", "20")),  # cap, also applied to Retry-After
+    "statuses": {429, 500, 502, 503, 504}
+}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# (URL prefix, bucket) pairs; every attempt at a matching URL takes a token first
+_rate_limits: List[Tuple[str, TokenBucket]] = []
+
+
+def get_session() -> requests.Session:
+    """The shared session, created on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONFIG["hosts"],
+                pool_maxsize=HTTP_POOL_CONFIG["connections_per_host"],
+                pool_block=True,
+                max_retries=0  # retries are handled in request() so they can back off
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def register_rate_limit(url_prefix: str, bucket: TokenBucket) -> None:
+    """Throttle every request whose URL starts with url_prefix through bucket"""
+    _rate_limits.append((url_prefix, bucket))
+
+
+def rate_limit_for(url: str) -> Optional[TokenBucket]:
+    return next((bucket for prefix, bucket in _rate_limits if url.startswith(prefix)), None)
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """Seconds the server asked us to wait, from a Retry-After header in either format"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry (0-based)"""
+    return random.uniform(0, min(RETRY_CONFIG["max_delay"], RETRY_CONFIG["backoff"] * 2 ** attempt))
+
+
+def request(method: str, url: str, timeout: Union[float, Tuple[float, float], None] = DEFAULT_TIMEOUT, **kwargs: Any) -> requests.Response:
+    """Send a request on the shared session, retrying connection errors, 429 and 5xx.
+
+    The last response is returned as-is when retries run out, so callers
+    keep checking status codes the way they would with plain requests.
+    """
+    attempts = max(1, RETRY_CONFIG["attempts"])
+    host = urlparse(url).netloc
+    bucket = rate_limit_for(url)
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        if bucket:
+            waited = bucket.acquire()
+            if waited:
+                metrics.observe("medreel_rate_limit_wait_seconds", waited, upstream=bucket.name)
+        try:
+            response = get_session().request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if last_attempt:
+                raise
+            delay = backoff_delay(attempt)
+            reason = type(e).__name__
+        else:
+            if response.status_code not in RETRY_CONFIG["statuses"] or last_attempt:
+                return response
+            delay = min(RETRY_CONFIG["max_delay"], retry_after(response) or backoff_delay(attempt))
+            reason = f"http_{response.status_code}"
+            response.close()
+
+        metrics.inc("medreel_http_retries_total", host=host, reason=reason)
+        logger.debug(f"Retrying {method} {host} in {delay:.2f}s ({reason})", extra={"data": {"url": url, "attempt": attempt + 1}})
+        time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    return request("POST", url, **kwargs)
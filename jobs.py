@@ -0,0 +1,195 @@
+"""Background analysis jobs that keep running across Streamlit reruns.
+
+Analyses run on a process-wide worker pool rather than in the script
+thread, so a widget click or a browser refresh only changes what the page
+shows. The UI keeps the job ID in session state and polls the job's stage,
+progress and partial results until it finishes.
+
+Submissions for a reel that is already being analyzed (same shortcode and
+language) join the in-flight job instead of starting another, so a viral
+reel pasted by many sessions costs one fetch, transcription and LLM call.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+import pipeline
+
+# Analyses running at once in this server process; later submissions queue
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+
+# Seconds a finished job stays retrievable for sessions that haven't polled it yet
+JOB_RETENTION = 3600
+
+STAGE_LABELS = {
+    "queued": "⏳ Waiting for a free analysis slot...",
+    "fetch": "🔮 Fetching reel data...",
+    "download": "📥 Downloading audio...",
+    "transcribe": "🎙️ Transcribing audio...",
+    "search": "🔍 Searching PubMed and Semantic Scholar databases...",
+    "analysis": "🧠 AI is analyzing the medical claims...",
+    "done": "✅ Analysis complete!",
+    "failed": "❌ Analysis failed"
+}
+
+_current = threading.local()
+
+
+class Job:
+    """One reel analysis: its stage, progress, partial results and pipeline log records."""
+
+    def __init__(self, reel_url: str, language: str):
+        self.id = uuid.uuid4().hex
+        self.key = pipeline.reel_cache_key(reel_url, language)
+        self.reel_url = reel_url
+        self.language = language
+        self.stage = "queued"
+        self.progress = 0.0  # within the current stage, where the stage reports it
+        self.result: Dict[str, Any] = {}  # caption, transcript, citations, analysis as they become known
+        self.partial_analysis = ""
+        self.api_response: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.failed_stage: Optional[str] = None
+        self.degraded: List[str] = []  # stages that fell back to an incomplete result
+        self.logs: List[Tuple[int, str, Any]] = []  # (level, message, data)
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in ("done", "failed")
+
+    def set_stage(self, stage: str) -> None:
+        self.stage = stage
+        self.progress = 0.0
+
+
+def current_job() -> Optional[Job]:
+    """The job the calling thread is working on, if any"""
+    return getattr(_current, "job", None)
+
+
+def with_job_context(fn: Callable) -> Callable:
+    """Wrap fn so pipeline logs from a worker thread still land on the submitting job"""
+    job = current_job()
+
+    def wrapper(*args, **kwargs):
+        previous = current_job()
+        _current.job = job
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.job = previous
+
+    return wrapper
+
+
+class JobLogHandler(logging.Handler):
+    """Attach pipeline log records to the job whose thread emitted them"""
+
+    def emit(self, record: logging.LogRecord):
+        job = current_job()
+        if job is not None:
+            job.logs.append((record.levelno, record.getMessage(), getattr(record, "data", None)))
+
+
+def run_analysis(job: Job) -> None:
+    """Drive the pipeline for one job, recording each stage as it starts"""
+    job.set_stage("fetch")
+    data = pipeline.fetch_reel_data(job.reel_url)
+    job.api_response = data
+    caption = job.result["caption"] = pipeline.extract_caption(data)
+    audio_url = pipeline.extract_audio_url(data)
+
+    job.set_stage("download")
+    audio_path = pipeline.download_audio(audio_url)
+    try:
+        job.set_stage("transcribe")
+        transcript = pipeline.transcribe_audio(
+            audio_path, job.language, lambda progress: setattr(job, "progress", progress), degraded=job.degraded
+        )
+    finally:
+        os.remove(audio_path)
+    if not transcript:
+        raise ValueError("Transcription failed. Please try again.")
+    job.result["transcript"] = transcript
+
+    job.set_stage("search")
+    medical_context, citations = pipeline.fetch_medical_info(transcript, caption, degraded=job.degraded)
+    job.result["citations"] = citations
+
+    job.set_stage("analysis")
+    analysis = pipeline.analyze_with_llm(
+        caption, transcript, medical_context, lambda text: setattr(job, "partial_analysis", text), degraded=job.degraded
+    )
+    job.result["analysis"] = analysis
+
+    # A degraded result is still shown, but the next request for this reel retries instead of reusing it
+    if job.degraded:
+        pipeline.debug_log("Result is degraded, not caching it", {"stages": job.degraded})
+        return
+    pipeline.RESULT_CACHE.set(pipeline.reel_cache_key(job.reel_url, job.language), dict(job.result))
+
+
+class JobQueue:
+    """Process-wide pool running analysis jobs, at most `workers` at a time."""
+
+    def __init__(self, workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="medreel-job")
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[str, Job] = {}  # reel_cache_key -> unfinished job
+        self._lock = threading.Lock()
+
+    def submit(self, reel_url: str, language: str) -> Job:
+        """Start analyzing a reel, or return the job already analyzing it"""
+        job = Job(reel_url, language)
+        with self._lock:
+            running = self._in_flight.get(job.key)
+            if running is not None:
+                metrics.inc("medreel_jobs_total", result="coalesced")
+                pipeline.debug_log("🔗 Joined in-flight analysis", {"job": running.id, "key": job.key})
+                return running
+            self._prune()
+            self._jobs[job.id] = job
+            self._in_flight[job.key] = job
+        metrics.inc("medreel_jobs_total", result="started")
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _run(self, job: Job) -> None:
+        _current.job = job
+        try:
+            run_analysis(job)
+            job.set_stage("done")
+        except Exception as e:
+            job.error = str(e)
+            job.failed_stage = job.stage
+            pipeline.debug_log("❌ Analysis job failed", {"job": job.id, "stage": job.stage, "error": str(e), "type": type(e).__name__})
+            job.set_stage("failed")
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+            _current.job = None
+
+
+JOB_QUEUE = JobQueue(ANALYSIS_WORKERS)
+
+pipeline.logger.addHandler(JobLogHandler())
+pipeline.logger.setLevel(logging.DEBUG)
+pipeline.worker_context = with_job_context
@@ -0,0 +1,189 @@
+"""Process-wide pipeline metrics with Prometheus text-format export.
+
+Every Streamlit session (and batch worker) in a process records into the
+same registry. Set METRICS_PORT to serve it over HTTP at /metrics, and/or
+METRICS_FILE to have it written to disk every METRICS_FILE_INTERVAL seconds.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_FILE_INTERVAL = float(os.getenv("METRICS_FILE_INTERVAL", "15"))
+
+# Seconds; covers everything from a cache lookup to a slow 70B completion
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+METRIC_HELP = {
+    "medreel_stage_duration_seconds": ("histogram", "Latency of each pipeline stage"),
+    "medreel_stage_errors_total": ("counter", "Pipeline stage failures by error type"),
+    "medreel_bytes_total": ("counter", "Bytes processed by pipeline stage"),
+    "medreel_http_retries_total": ("counter", "Outbound HTTP retries by host and reason"),
+    "medreel_rate_limit_wait_seconds": ("histogram", "Time requests spent queued by the upstream rate limiter"),
+    "medreel_jobs_total": ("counter", "Analysis submissions, started or coalesced onto an in-flight job"),
+    "medreel_llm_tokens_total": ("counter", "Groq tokens used by pipeline stage, split into prompt and completion"),
+    "medreel_chat_local_answers_total": ("counter", "Chat questions answered from stored context without an LLM call, by intent"),
+    "medreel_cache_requests_total": ("counter", "Cache lookups by cache and result"),
+    "medreel_cache_entries": ("gauge", "Entries currently held by in-memory caches")
+}
+
+logger = logging.getLogger("medreel.metrics")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(**labels: str) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], List[float]] = {}  # bucket counts + [sum, count]
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Labels, float]]]] = []
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, _labels(**labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, _labels(**labels))
+        with self._lock:
+            series = self._histograms.setdefault(key, [0.0] * (len(LATENCY_BUCKETS) + 2))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, Labels, float]]]) -> None:
+        """Add a callback yielding (name, labels, value) samples computed at render time"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    @contextmanager
+    def track(self, stage: str) -> Iterator[None]:
+        """Time a stage, counting any exception that escapes it as an error"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.inc("medreel_stage_errors_total", stage=stage, error=type(e).__name__)
+            raise
+        finally:
+            self.observe("medreel_stage_duration_seconds", time.perf_counter() - started, stage=stage)
+
+    def render(self) -> str:
+        """Prometheus text exposition of every metric"""
+        with self._lock:
+            samples: Dict[str, List[str]] = {name: [] for name in METRIC_HELP}
+            for (name, labels), value in sorted(self._counters.items()):
+                samples.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value:g}")
+            for (name, labels), series in sorted(self._histograms.items()):
+                lines = samples.setdefault(name, [])
+                for bound, count in zip(LATENCY_BUCKETS, series):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {count:g}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {series[-1]:g}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {series[-2]:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {series[-1]:g}")
+            collectors = list(self._collectors)
+
+        for collector in collectors:
+            for name, labels, value in collector():
+                samples.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value:g}")
+
+        output = []
+        for name, lines in samples.items():
+            if not lines:
+                continue
+            metric_type, help_text = METRIC_HELP.get(name, ("untyped", name))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {metric_type}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+track = REGISTRY.track
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+
+
+def register_cache(name: str, cache) -> None:
+    """Export a cache's hit/miss counters (any object with a stats() dict)"""
+    def collect():
+        stats = cache.stats()
+        yield "medreel_cache_requests_total", _labels(cache=name, result="hit"), stats["hits"]
+        yield "medreel_cache_requests_total", _labels(cache=name, result="miss"), stats["misses"]
+        if "size" in stats:
+            yield "medreel_cache_entries", _labels(cache=name), stats["size"]
+
+    REGISTRY.register_collector(collect)
+
+
+def write_metrics_file(path: str) -> None:
+    """Atomically write the current metrics for a file-based scraper"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the console
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters() -> None:
+    """Start the HTTP endpoint and/or file writer configured via env, once per process"""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    if METRICS_PORT:
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), _MetricsHandler)
+        except OSError as e:
+            logger.warning(f"Metrics endpoint not started on port {METRICS_PORT}: {e}")
+        else:
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+
+    if METRICS_FILE:
+        def write_periodically():
+            while True:
+                time.sleep(METRICS_FILE_INTERVAL)
+                write_metrics_file(METRICS_FILE)
+
+        threading.Thread(target=write_periodically, name="metrics-file", daemon=True).start()
@@ -0,0 +1,1191 @@
+"""MedReel analysis pipeline: reel fetch, audio download, transcription,
+literature search and LLM analysis.
+
+Nothing in here touches Streamlit, so the same functions back both the web
+app (app.py) and headless batch runs (batch.py). Progress is reported via
+the "medreel" logger and optional callbacks.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
+
+import numpy as np
+import speech_recognition as sr
+from dotenv import load_dotenv
+from groq import Groq
+from pydub import AudioSegment
+
+import asr
+import http_client
+import metrics
+import prompting
+from cache import DiskCache, TTLCache
+from groq_pool import GroqClientPool
+from rate_limit import TokenBucket
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger("medreel")
+
+# Configuration - FIXED: Load from environment variable
+RAPIDAPI_CONFIG = {
+    "url": os.getenv("RAPIDAPI_URL", "https://social-download-all-in-one.p.rapidapi.com/v1/social/autolink"),
+    "headers": {
+        "x-rapidapi-key": os.getenv("RAPIDAPI_KEY", ""),
+        "x-rapidapi-host": "social-download-all-in-one.p.rapidapi.com",
+        "Content-Type": "application/json"
+    },
+    "timeout": (5, 30)  # (connect, read) seconds
+}
+
+# Groq API Keys with fallback
+GROQ_API_KEYS = [
+    os.getenv("GROQ_API_KEY_1", ""),
+    os.getenv("GROQ_API_KEY_2", ""),
+    os.getenv("GROQ_API_KEY_3", "")
+]
+
+# Seconds a failed Groq key is skipped before it is probed again
+GROQ_KEY_COOLDOWN = float(os.getenv("GROQ_KEY_COOLDOWN", "60"))
+
+# Semantic Scholar API Key
+SEMANTIC_SCHOLAR_API_KEY = os.getenv("Semantic_Scholar_API_Key", "")
+
+# Literature API base URLs (overridable so benchmarks can point at local stand-ins)
+PUBMED_EUTILS_URL = os.getenv("PUBMED_EUTILS_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils")
+SEMANTIC_SCHOLAR_API_URL = os.getenv("SEMANTIC_SCHOLAR_API_URL", "https://api.semanticscholar.org/graph/v1")
+
+# Max concurrent speech recognition requests per transcription (google backend)
+TRANSCRIBE_MAX_WORKERS = int(os.getenv("TRANSCRIBE_MAX_WORKERS", "4"))
+
+# Speech recognition engine, see asr.py: "google" (web API) or "whisper" (local CPU)
+ASR_BACKEND_OPTIONS = {
+    "google": {"max_workers": TRANSCRIBE_MAX_WORKERS},
+    "whisper": {
+        "model": os.getenv("WHISPER_MODEL", "small"),
+        "compute_type": os.getenv("WHISPER_COMPUTE_TYPE", "int8"),
+        "max_workers": int(os.getenv("WHISPER_WORKERS", "2")),
+        "batch_size": int(os.getenv("WHISPER_BATCH_SIZE", "4"))
+    }
+}
+ASR_BACKEND_NAME = os.getenv("ASR_BACKEND", "google")
+ASR_BACKEND = asr.create_backend(ASR_BACKEND_NAME, **ASR_BACKEND_OPTIONS.get(ASR_BACKEND_NAME, {}))
+
+# Audio download limits
+AUDIO_DOWNLOAD_CONFIG = {
+    "block_size": 64 * 1024,
+    "max_bytes": int(os.getenv("MAX_AUDIO_BYTES", str(50 * 1024 * 1024))),
+    "max_seconds": int(os.getenv("MAX_AUDIO_SECONDS", "600")),
+    "timeout": (5, 30),  # (connect, read) seconds
+    "deadline": 120  # total seconds allowed for the whole download
+}
+
+# Literature search fans out over the distinct claims in each reel
+CLAIM_SEARCH_CONFIG = {
+    "model": os.getenv("CLAIM_MODEL", "llama-3.1-8b-instant"),  # small model; extraction is simple
+    "max_claims": int(os.getenv("MAX_CLAIMS", "4")),
+    "max_workers": int(os.getenv("CLAIM_SEARCH_WORKERS", "8")),  # concurrent PubMed + Semantic Scholar searches
+    "window_words": 25  # transcript window per claim when falling back to keyword matching
+}
+
+# Words that mark a stretch of transcript as a health claim, for the keyword fallback
+HEALTH_TERMS = {
+    "cancer", "diabetes", "sugar", "insulin", "fat", "weight", "cholesterol", "blood", "pressure",
+    "heart", "liver", "kidney", "gut", "immunity", "immune", "vitamin", "protein", "detox", "toxins",
+    "cure", "cures", "disease", "hormone", "hormones", "thyroid", "pcos", "skin", "hair", "sleep",
+    "metabolism", "inflammation", "infection", "virus", "vaccine", "supplement", "doctor", "medicine",
+    "dawai", "bimari", "rog", "sehat", "vajan", "motapa", "khoon", "ilaj",
+    # Devanagari, as Google's hi-IN recognizer writes them
+    "कैंसर", "शुगर", "चीनी", "मधुमेह", "डायबिटीज", "इंसुलिन", "वजन", "मोटापा", "चर्बी", "फैट",
+    "कोलेस्ट्रॉल", "खून", "ब्लड", "प्रेशर", "दिल", "हृदय", "लिवर", "किडनी", "पेट", "इम्युनिटी",
+    "विटामिन", "प्रोटीन", "डिटॉक्स", "इलाज", "बीमारी", "बीमारियां", "बीमारियों", "रोग", "दवा", "दवाई",
+    "हार्मोन", "थायराइड", "त्वचा", "बाल", "नींद", "सूजन", "संक्रमण", "वायरस", "वैक्सीन", "टीका",
+    "डॉक्टर", "सेहत", "स्वास्थ्य", "पीसीओएस", "मेटाबॉलिज्म"
+}
+
+# Analysis requests are held to a token budget; long transcripts keep their most claim-dense spans
+ANALYSIS_PROMPT_CONFIG = {
+    "model": "llama-3.3-70b-versatile",
+    "budget": int(os.getenv("ANALYSIS_TOKEN_BUDGET", "8000")),  # prompt plus reply tokens per request
+    "reply_tokens": 2048,  # max_tokens, reserved out of the budget
+    "caption_share": 0.1,  # most of the prompt budget the caption may take
+    "references_share": 0.35  # most of the prompt budget the literature context may take
+}
+
+# Chat prompts are held to a token budget; older turns are folded into a rolling summary
+CHAT_CONTEXT_CONFIG = {
+    "budget": int(os.getenv("CHAT_TOKEN_BUDGET", "3000")),  # prompt tokens per chat request
+    "reply_tokens": 1024,  # max_tokens for the answer, on top of the budget
+    "analysis_share": 0.3,  # most of the budget the reel's analysis may take
+    "history_share": 0.35,  # most of the budget the summary plus recent turns may take
+    "citations_share": 0.15,  # most of the budget the source list may take
+    "question_share": 0.1,  # most of the budget the question itself may take
+    "min_recent_messages": 2,  # always resent (trimmed if huge), however long
+    "fold_trigger": 2.0,  # summarize once unsummarized turns reach this multiple of their share
+    "summary_model": os.getenv("CHAT_SUMMARY_MODEL", CLAIM_SEARCH_CONFIG["model"]),
+    "summary_tokens": 200
+}
+
+# Audio is decoded straight to the format the recognizer wants: 16 kHz mono 16-bit PCM
+PCM_FORMAT = {"frame_rate": 16000, "sample_width": 2}
+DECODE_BLOCK_BYTES = 64 * 1024  # decoded PCM read from ffmpeg at a time
+
+# Silence-aware segmentation: recognizer requests are cut on pauses, not fixed boundaries
+SEGMENT_CONFIG = {
+    "max_ms": int(float(os.getenv("SEGMENT_MAX_SECONDS", "15")) * 1000),  # longest segment sent to the recognizer
+    "min_silence_ms": 400,  # pause length that counts as a split point
+    "min_speech_ms": 150,  # shorter bursts (clicks, pops) are dropped
+    "keep_silence_ms": 200,  # padding kept around speech so word edges aren't clipped
+    "frame_ms": 10,  # RMS analysis window
+    # Energy threshold, calibrated once per track: the louder of
+    "silence_db": 16,  # dB below the track's overall RMS, and
+    "noise_percentile": 10,  # this percentile of frame RMS (the noise floor)...
+    "noise_factor": 2.0,  # ...times this factor, but never above
+    "noise_cap_db": 6  # dB below the overall RMS, so a loud music bed can't hide the voice
+}
+
+# Persistent cache of finished analyses, keyed by reel shortcode + language
+CACHE_DIR = os.getenv("MEDREEL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "medreel_cache"))
+RESULT_CACHE = DiskCache(
+    os.path.join(CACHE_DIR, "cache.sqlite3"),
+    table="results",
+    ttl=float(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "500"))
+)
+
+# Transcripts keyed by a hash of the decoded audio, so reposts under new URLs hit too
+TRANSCRIPT_CACHE = DiskCache(
+    os.path.join(CACHE_DIR, "cache.sqlite3"),
+    table="transcripts",
+    ttl=float(os.getenv("TRANSCRIPT_CACHE_TTL", str(30 * 24 * 3600))),
+    max_entries=int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "2000"))
+)
+
+# In-memory literature search caches: TTL in seconds, max entries
+LITERATURE_CACHE_CONFIG = {
+    "esearch": {
+        "ttl": float(os.getenv("ESEARCH_CACHE_TTL", str(24 * 3600))),
+        "max_entries": int(os.getenv("ESEARCH_CACHE_MAX_ENTRIES", "1000"))
+    },
+    "esummary": {
+        "ttl": float(os.getenv("ESUMMARY_CACHE_TTL", str(7 * 24 * 3600))),
+        "max_entries": int(os.getenv("ESUMMARY_CACHE_MAX_ENTRIES", "5000"))
+    },
+    "efetch": {
+        "ttl": float(os.getenv("EFETCH_CACHE_TTL", str(7 * 24 * 3600))),
+        "max_entries": int(os.getenv("EFETCH_CACHE_MAX_ENTRIES", "5000"))
+    },
+    "semantic_scholar": {
+        "ttl": float(os.getenv("SEMANTIC_SCHOLAR_CACHE_TTL", str(24 * 3600))),
+        "max_entries": int(os.getenv("SEMANTIC_SCHOLAR_CACHE_MAX_ENTRIES", "1000"))
+    }
+}
+LITERATURE_CACHES = {
+    name: TTLCache(ttl=config["ttl"], max_entries=config["max_entries"])
+    for name, config in LITERATURE_CACHE_CONFIG.items()
+}
+
+# Requests per second each upstream allows; the buckets live in CACHE_DIR so
+# every session and worker process on this host shares one budget
+RATE_LIMIT_CONFIG = {
+    "rapidapi": {
+        "url": RAPIDAPI_CONFIG["url"],
+        "rate": float(os.getenv("RAPIDAPI_RATE_LIMIT", "5")),
+        "burst": 5
+    },
+    "ncbi": {
+        "url": PUBMED_EUTILS_URL,
+        "rate": float(os.getenv("NCBI_RATE_LIMIT", "3")),  # E-utilities allow 3/s without an API key
+        "burst": 3
+    },
+    "semantic_scholar": {
+        "url": SEMANTIC_SCHOLAR_API_URL,
+        "rate": float(os.getenv("SEMANTIC_SCHOLAR_RATE_LIMIT", "1")),
+        "burst": 1
+    }
+}
+for name, config in RATE_LIMIT_CONFIG.items():
+    http_client.register_rate_limit(
+        config["url"],
+        TokenBucket(name, config["rate"], config["burst"], os.path.join(CACHE_DIR, f"ratelimit_{name}.json"))
+    )
+
+metrics.register_cache("result", RESULT_CACHE)
+metrics.register_cache("transcript", TRANSCRIPT_CACHE)
+for name, cache in LITERATURE_CACHES.items():
+    metrics.register_cache(name, cache)
+
+GROQ_POOL = GroqClientPool(GROQ_API_KEYS, cooldown=GROQ_KEY_COOLDOWN)
+
+# Minimum seconds between on_token callbacks while LLM tokens stream in
+STREAM_RENDER_INTERVAL = 0.1
+
+# Applied to every callable run on a worker thread; jobs.py swaps in a wrapper
+# that carries the current job so fan-out threads still log to it
+worker_context: Callable[[Callable], Callable] = lambda fn: fn
+
+def debug_log(message: str, data: Any = None):
+    """Log debug information; the structured payload rides along as record.data"""
+    logger.debug(message, extra={"data": data})
+
+def get_literature_cache(name: str) -> TTLCache:
+    """Process-wide literature cache, shared across sessions"""
+    return LITERATURE_CACHES[name]
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query for cache lookups (case, punctuation, whitespace)"""
+    # \w alone splits Devanagari words at their vowel signs, so those are kept explicitly (but not danda)
+    return " ".join(re.findall(r"[\w\u0900-\u0963\u0966-\u097f]+", query.lower()))
+
+def get_groq_client() -> Tuple[Groq, int]:
+    """Get a cached, healthy Groq client with fallback mechanism"""
+    def on_failure(idx: int, e: Exception):
+        debug_log(f"❌ API Key {idx + 1} failed", {"error": str(e)})
+        logger.warning(f"⚠️ API Key {idx + 1} failed, trying next...")
+
+    client, idx = GROQ_POOL.acquire(on_failure)
+    debug_log(f"✅ Using API Key #{idx + 1}")
+    return client, idx
+
+def fetch_reel_data(reel_url: str) -> Dict[str, Any]:
+    """Fetch reel metadata (caption, media URLs) from RapidAPI"""
+    debug_log("Fetching reel data", {"url": reel_url})
+
+    payload = {"url": reel_url}
+    with metrics.track("rapidapi_fetch"):
+        response = http_client.post(
+            RAPIDAPI_CONFIG["url"],
+            json=payload,
+            headers=RAPIDAPI_CONFIG["headers"],
+            timeout=RAPIDAPI_CONFIG["timeout"]
+        )
+
+        debug_log("API Response Status", {"status_code": response.status_code})
+
+        data = response.json()
+    debug_log("Full API Response", data)
+    return data
+
+def extract_caption(data: Dict[str, Any]) -> str:
+    """Extract the caption from the RapidAPI response"""
+    caption = data.get('title', '') or data.get('caption', '') or data.get('description', '') or 'No Caption Found'
+    debug_log("Extracted caption", {"caption": caption})
+    return caption
+
+def extract_audio_url(data: Dict[str, Any]) -> str:
+    """Extract audio URL from API response with multiple fallback strategies"""
+    debug_log("Extracting audio URL from response", data)
+
+    # Strategy 1: Check medias array
+    if 'medias' in data and isinstance(data['medias'], list):
+        debug_log(f"Found 'medias' array with {len(data['medias'])} items")
+
+        # Try to find audio in medias
+        for idx, media in enumerate(data['medias']):
+            debug_log(f"Media {idx}", media)
+
+            # Check if it's audio type
+            if isinstance(media, dict):
+                if media.get('type') == 'audio' or 'audio' in media.get('url', '').lower():
+                    debug_log(f"Found audio at index {idx}")
+                    return media['url']
+
+        # If not found by type, try index 1 (original approach)
+        if len(data['medias']) > 1:
+            debug_log("Using medias[1] as fallback")
+            return data['medias'][1]['url']
+
+    # Strategy 2: Check for direct audio_url field
+    if 'audio_url' in data:
+        debug_log("Found 'audio_url' field")
+        return data['audio_url']
+
+    # Strategy 3: Check medias dict (not array)
+    if 'medias' in data and isinstance(data['medias'], dict):
+        if 'audio' in data['medias']:
+            debug_log("Found 'medias.audio' field")
+            return data['medias']['audio']
+
+    # Strategy 4: Look for any field containing 'audio'
+    for key, value in data.items():
+        if 'audio' in key.lower() and isinstance(value, str) and value.startswith('http'):
+            debug_log(f"Found audio URL in field: {key}")
+            return value
+
+    raise KeyError(f"Could not find audio URL in response. Available keys: {list(data.keys())}")
+
+def normalize_reel_id(reel_url: str) -> str:
+    """Reduce a reel URL to its shortcode so /reel/, /reels/, /p/ and ?igsh= variants match"""
+    match = re.search(r'instagram\.com/(?:[\w.]+/)?(?:reels?|p|tv)/([A-Za-z0-9_-]+)', reel_url)
+    if match:
+        return match.group(1)
+    # Not an Instagram URL we recognize - fall back to the URL without query string
+    return reel_url.split('?')[0].strip().rstrip('/').lower()
+
+def reel_cache_key(reel_url: str, language: str) -> str:
+    """Cache key for a finished analysis"""
+    return f"{normalize_reel_id(reel_url)}:{language}"
+
+def download_audio(audio_url: str) -> str:
+    """Stream audio to a temp file in fixed-size blocks, enforcing the byte cap"""
+    debug_log("Downloading audio", {"url": audio_url})
+    max_bytes = AUDIO_DOWNLOAD_CONFIG["max_bytes"]
+    deadline = time.monotonic() + AUDIO_DOWNLOAD_CONFIG["deadline"]
+    size = 0
+
+    with metrics.track("audio_download"):
+        with http_client.get(audio_url, stream=True, timeout=AUDIO_DOWNLOAD_CONFIG["timeout"]) as response:
+            response.raise_for_status()
+
+            # Reject oversized media before reading the body when the server tells us its size
+            content_length = int(response.headers.get('Content-Length') or 0)
+            if content_length > max_bytes:
+                raise ValueError(f"Audio is too large ({content_length} bytes, limit is {max_bytes})")
+
+            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_audio:
+                audio_path = temp_audio.name
+                try:
+                    for block in response.iter_content(chunk_size=AUDIO_DOWNLOAD_CONFIG["block_size"]):
+                        size += len(block)
+                        if size > max_bytes:
+                            raise ValueError(f"Audio exceeds the {max_bytes} byte download limit")
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"Audio download took longer than {AUDIO_DOWNLOAD_CONFIG['deadline']}s")
+                        temp_audio.write(block)
+                except Exception:
+                    temp_audio.close()
+                    os.remove(audio_path)
+                    raise
+
+    metrics.inc("medreel_bytes_total", size, stage="audio_download")
+    debug_log("Audio downloaded", {"path": audio_path, "size": size})
+    return audio_path
+
+def frame_rms(pcm: bytes, frame_ms: int) -> np.ndarray:
+    """RMS energy of each frame_ms window of decoded PCM, computed in one vectorized pass"""
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    frame_len = max(1, PCM_FORMAT["frame_rate"] * frame_ms // 1000)
+    n_frames = -(-len(samples) // frame_len)
+    samples = np.pad(samples, (0, n_frames * frame_len - len(samples)))
+    return np.sqrt(np.mean(np.square(samples.reshape(n_frames, frame_len)), axis=1))
+
+def energy_threshold(rms: np.ndarray) -> float:
+    """Silence threshold for the whole track, from its overall loudness and noise floor"""
+    overall = float(np.sqrt(np.mean(np.square(rms))))
+    noise_floor = float(np.percentile(rms, SEGMENT_CONFIG["noise_percentile"]))
+    noise_term = min(noise_floor * SEGMENT_CONFIG["noise_factor"], overall * 10 ** (-SEGMENT_CONFIG["noise_cap_db"] / 20))
+    return max(overall * 10 ** (-SEGMENT_CONFIG["silence_db"] / 20), noise_term)
+
+def speech_bounds(rms: np.ndarray, threshold: float) -> List[List[int]]:
+    """Millisecond [start, end) spans of speech, merged up to the recognizer's segment limit"""
+    frame_ms = SEGMENT_CONFIG["frame_ms"]
+    max_ms = SEGMENT_CONFIG["max_ms"]
+    keep_ms = SEGMENT_CONFIG["keep_silence_ms"]
+    total_ms = len(rms) * frame_ms
+
+    # Runs of frames above the threshold, as [start, end) frame indices
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], (rms > threshold).astype(np.int8), [0]))))
+    starts, ends = edges[::2], edges[1::2]
+
+    # Pauses shorter than min_silence_ms don't split speech
+    split = (starts[1:] - ends[:-1]) * frame_ms >= SEGMENT_CONFIG["min_silence_ms"]
+    starts = np.concatenate((starts[:1], starts[1:][split]))
+    ends = np.concatenate((ends[:-1][split], ends[-1:]))
+
+    # Greedily merge neighbouring speech regions while the merged span still fits
+    bounds: List[List[int]] = []
+    for start, end in zip(starts * frame_ms, ends * frame_ms):
+        if end - start < SEGMENT_CONFIG["min_speech_ms"]:
+            continue
+        start, end = max(0, int(start) - keep_ms), min(total_ms, int(end) + keep_ms)
+        if bounds and end - bounds[-1][0] <= max_ms:
+            bounds[-1][1] = end
+        else:
+            bounds.append([start, end])
+    return bounds
+
+def segment_bounds(rms: np.ndarray) -> List[Tuple[int, int]]:
+    """Pause-aligned [start, end) ms spans no longer than the recognizer accepts, silence dropped"""
+    if not rms.any():
+        return []  # digital silence
+
+    threshold = energy_threshold(rms)
+    bounds = speech_bounds(rms, threshold)
+    debug_log("Calibrated energy threshold", {"rms_threshold": round(threshold, 1), "speech_spans": len(bounds)})
+    if not bounds:
+        # Sound, but nothing clears the threshold (e.g. voice under steady music): send it all
+        bounds = [[0, len(rms) * SEGMENT_CONFIG["frame_ms"]]]
+
+    # Speech with no usable pause is cut at the limit
+    max_ms = SEGMENT_CONFIG["max_ms"]
+    return [
+        (offset, min(end, offset + max_ms))
+        for start, end in bounds
+        for offset in range(start, end, max_ms)
+    ]
+
+def decode_audio(audio_path: str, pcm_path: str) -> Tuple[np.ndarray, str, int]:
+    """Stream audio through ffmpeg into a raw PCM file, returning frame RMS, PCM hash and byte count.
+
+    Only one block of decoded audio is held in memory at a time, however
+    long the reel is.
+    """
+    frame_bytes = PCM_FORMAT["frame_rate"] * SEGMENT_CONFIG["frame_ms"] // 1000 * PCM_FORMAT["sample_width"]
+    block_size = frame_bytes * (DECODE_BLOCK_BYTES // frame_bytes)  # whole RMS frames per block
+    command = [
+        AudioSegment.converter, "-nostdin", "-v", "error",
+        "-i", audio_path,
+        "-t", str(AUDIO_DOWNLOAD_CONFIG["max_seconds"]),
+        "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(PCM_FORMAT["frame_rate"]),
+        "pipe:1"
+    ]
+
+    audio_hash = hashlib.sha256()
+    rms_blocks = []
+    size = 0
+    # stderr goes to a file, not a pipe: a corrupt input can log more than a pipe buffer
+    # holds, and ffmpeg would block on it while we wait for stdout to end
+    with tempfile.TemporaryFile() as stderr_file, open(pcm_path, "wb") as pcm_file, \
+            subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file) as process:
+        assert process.stdout is not None
+        while True:
+            block = process.stdout.read(block_size)
+            if not block:
+                break
+            audio_hash.update(block)
+            rms_blocks.append(frame_rms(block, SEGMENT_CONFIG["frame_ms"]))
+            pcm_file.write(block)
+            size += len(block)
+        if process.wait() != 0:
+            stderr_file.seek(max(0, stderr_file.seek(0, os.SEEK_END) - 2048))
+            stderr = stderr_file.read().decode(errors="replace")
+            raise RuntimeError(f"ffmpeg could not decode the audio: {stderr.strip()[-300:]}")
+
+    audio_hash.update(f"{PCM_FORMAT['frame_rate']}:{PCM_FORMAT['sample_width']}".encode())
+    rms = np.concatenate(rms_blocks) if rms_blocks else np.zeros(0, dtype=np.float32)
+    return rms, audio_hash.hexdigest(), size
+
+def iter_segments(pcm_path: str, bounds: List[Tuple[int, int]]) -> Iterator[sr.AudioData]:
+    """Lazily read each [start, end) ms span of the decoded PCM file as recognizer input"""
+    bytes_per_ms = PCM_FORMAT["frame_rate"] // 1000 * PCM_FORMAT["sample_width"]
+    with open(pcm_path, "rb") as pcm_file:
+        for start, end in bounds:
+            pcm_file.seek(start * bytes_per_ms)
+            yield sr.AudioData(pcm_file.read((end - start) * bytes_per_ms), PCM_FORMAT["frame_rate"], PCM_FORMAT["sample_width"])
+
+def transcribe_audio(audio_path: str, language: str, on_progress: Optional[Callable[[float], None]] = None,
+                     degraded: Optional[List[str]] = None) -> str:
+    """Transcribe audio to text in pause-aligned chunks, recognizing batches of chunks concurrently
+
+    A batch that fails leaves its chunks out of the transcript. Such a
+    partial transcript isn't cached, and "transcribe" is appended to
+    degraded so the caller doesn't cache what it builds on it either.
+    """
+    backend = ASR_BACKEND
+    # Chunk latency stays its own series; batched engines are timed per batch under another name
+    recognize_stage = "recognize_chunk" if backend.batch_size == 1 else "recognize_batch"
+
+    def recognize_batch(batch: List[sr.AudioData]) -> List[str]:
+        """Recognize a batch of chunks on a worker thread"""
+        with metrics.track(recognize_stage):
+            return backend.recognize_batch(batch, language)
+
+    debug_log(f"Starting transcription for: {audio_path}", {"language": language, "backend": backend.cache_id})
+
+    with tempfile.NamedTemporaryFile(suffix='.pcm', delete=False) as pcm_file:
+        pcm_path = pcm_file.name
+    try:
+        with metrics.track("decode"):
+            rms, audio_hash, size = decode_audio(audio_path, pcm_path)
+        metrics.inc("medreel_bytes_total", size, stage="decode")
+        total_ms = len(rms) * SEGMENT_CONFIG["frame_ms"]
+        if total_ms >= AUDIO_DOWNLOAD_CONFIG["max_seconds"] * 1000:
+            debug_log(f"Audio truncated to {AUDIO_DOWNLOAD_CONFIG['max_seconds']}s")
+
+        # Identical decoded audio in the same language and engine always yields the same transcript
+        cache_key = f"{backend.cache_id}:{asr.LANGUAGES[language]}:{audio_hash}"
+        cached_transcript = TRANSCRIPT_CACHE.get(cache_key)
+        if cached_transcript:
+            debug_log("⚡ Transcript cache hit", {"key": cache_key})
+            return cached_transcript
+
+        with metrics.track("segment"):
+            bounds = segment_bounds(rms)
+        speech_ms = sum(end - start for start, end in bounds)
+        debug_log(f"Dropped {(total_ms - speech_ms) / 1000:.1f}s of silence", {"speech_ms": speech_ms, "total_ms": total_ms})
+        if not bounds:
+            return ""
+        results: List[str] = [""] * len(bounds)
+
+        batch_size = max(1, backend.batch_size)
+        max_workers = max(1, min(backend.max_workers, -(-len(bounds) // batch_size)))
+        debug_log(f"Total chunks to process: {len(bounds)}", {"batch_size": batch_size, "workers": max_workers})
+
+        done = 0
+        failed = False
+
+        def collect(future, first: int):
+            """Record one finished batch; logging and progress stay on the calling thread"""
+            nonlocal done, failed
+            try:
+                texts = future.result()
+            except sr.RequestError as e:
+                texts = []
+                failed = True
+                debug_log(f"Chunks {first+1}+: API error", {"error": str(e)})
+                logger.warning(f"⚠️ API error: {str(e)}")
+            except Exception as e:
+                texts = []
+                failed = True
+                debug_log(f"Chunks {first+1}+: Unexpected error", {"error": str(e)})
+
+            for i, text in enumerate(texts, first):
+                results[i] = text
+                if text:
+                    debug_log(f"Chunk {i+1} transcribed successfully", {"text": text[:50] + "..." if len(text) > 50 else text})
+                else:
+                    debug_log(f"Chunk {i+1}: Speech not recognized")
+
+            done = min(len(bounds), done + batch_size)
+            if on_progress:
+                on_progress(done / len(bounds))
+
+        # Recognize batches concurrently, reading chunks from disk only when a slot frees up
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures: Dict[Any, int] = {}
+            segments = iter_segments(pcm_path, bounds)
+            for first in range(0, len(bounds), batch_size):
+                batch = [audio_data for _, audio_data in zip(range(batch_size), segments)]
+                futures[executor.submit(recognize_batch, batch)] = first
+                if len(futures) >= max_workers * 2:
+                    finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        collect(future, futures.pop(future))
+            for future in as_completed(futures):
+                collect(future, futures[future])
+    finally:
+        os.remove(pcm_path)
+
+    # Reassemble in chunk order, skipping chunks with no recognized speech
+    final_transcript = " ".join(text for text in results if text)
+    if failed:
+        debug_log("Transcript is missing failed chunks, not caching it", {"key": cache_key})
+        if degraded is not None:
+            degraded.append("transcribe")
+    elif final_transcript:
+        TRANSCRIPT_CACHE.set(cache_key, final_transcript)
+    debug_log("Transcription completed", {"length": len(final_transcript), "preview": final_transcript[:100] + "..." if len(final_transcript) > 100 else final_transcript})
+
+    return final_transcript
+
+def fetch_semantic_scholar_papers(query: str) -> List[Dict[str, Any]]:
+    """Fetch papers from Semantic Scholar API"""
+    try:
+        debug_log("Fetching papers from Semantic Scholar", {"query": query})
+
+        cache = get_literature_cache("semantic_scholar")
+        cached_papers = cache.get(normalize_query(query))
+        if cached_papers is not None:
+            debug_log(f"⚡ Semantic Scholar cache hit ({len(cached_papers)} papers)", cache.stats())
+            return cached_papers
+
+        headers = {}
+        if SEMANTIC_SCHOLAR_API_KEY:
+            headers["x-api-key"] = SEMANTIC_SCHOLAR_API_KEY
+            debug_log("Using Semantic Scholar API key")
+        else:
+            debug_log("No Semantic Scholar API key found - using rate-limited access")
+
+        # Search for papers
+        search_url = f"{SEMANTIC_SCHOLAR_API_URL}/paper/search"
+        params = {
+            "query": query,
+            "limit": 5,
+            "fields": "title,abstract,url,year,authors,citationCount,publicationTypes,externalIds"
+        }
+
+        with metrics.track("semantic_scholar"):
+            response = http_client.get(search_url, params=params, headers=headers, timeout=10)
+
+        if response.status_code == 200:
+            data = response.json()
+            papers = data.get('data', [])
+            cache.set(normalize_query(query), papers)
+            debug_log(f"✅ Found {len(papers)} papers from Semantic Scholar", {"papers": [p.get('title', '') for p in papers]})
+            return papers
+        else:
+            metrics.inc("medreel_stage_errors_total", stage="semantic_scholar", error=f"http_{response.status_code}")
+            debug_log(f"❌ Semantic Scholar API error - Status: {response.status_code}", {"response": response.text[:200]})
+            return []
+
+    except Exception as e:
+        debug_log("❌ Semantic Scholar search error", {"error": str(e), "type": type(e).__name__})
+        return []
+
+def search_pubmed_ids(query: str) -> List[str]:
+    """PMIDs of the top PubMed matches for a query (esearch)"""
+    try:
+        debug_log("Fetching papers from PubMed", {"query": query})
+
+        esearch_cache = get_literature_cache("esearch")
+        pmids = esearch_cache.get(normalize_query(query))
+        if pmids is not None:
+            debug_log("⚡ PubMed search cache hit", {"pmids": pmids, **esearch_cache.stats()})
+            return pmids
+
+        base_url = f"{PUBMED_EUTILS_URL}/esearch.fcgi"
+        params = {
+            "db": "pubmed",
+            "term": query,
+            "retmax": 3,
+            "retmode": "json"
+        }
+
+        with metrics.track("pubmed_esearch"):
+            response = http_client.get(base_url, params=params, timeout=10)
+        if response.status_code != 200:
+            metrics.inc("medreel_stage_errors_total", stage="pubmed_esearch", error=f"http_{response.status_code}")
+            debug_log(f"❌ PubMed search failed - Status: {response.status_code}")
+            return []
+
+        pmids = response.json().get('esearchresult', {}).get('idlist', [])
+        esearch_cache.set(normalize_query(query), pmids)
+        debug_log("✅ PubMed search results", {"pmids": pmids, "count": len(pmids)})
+        return pmids
+
+    except Exception as e:
+        debug_log("❌ PubMed search error", {"error": str(e), "type": type(e).__name__})
+        return []
+
+def fetch_pubmed_summaries(pmids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Article summaries for a set of PMIDs, fetching every uncached one in a single esummary call"""
+    esummary_cache = get_literature_cache("esummary")
+    summaries = {pmid: esummary_cache.get(pmid) for pmid in pmids}
+    missing = [pmid for pmid, summary in summaries.items() if summary is None]
+
+    if missing:
+        try:
+            summary_url = f"{PUBMED_EUTILS_URL}/esummary.fcgi"
+            summary_params = {
+                "db": "pubmed",
+                "id": ",".join(missing),
+                "retmode": "json"
+            }
+            with metrics.track("pubmed_esummary"):
+                summary_response = http_client.get(summary_url, params=summary_params, timeout=10)
+            if summary_response.status_code != 200:
+                metrics.inc("medreel_stage_errors_total", stage="pubmed_esummary", error=f"http_{summary_response.status_code}")
+                debug_log(f"❌ PubMed summary fetch failed - Status: {summary_response.status_code}")
+            else:
+                result = summary_response.json().get('result', {})
+                for pmid in missing:
+                    summaries[pmid] = result.get(pmid) or None
+                    if summaries[pmid]:
+                        esummary_cache.set(pmid, summaries[pmid])
+        except Exception as e:
+            debug_log("❌ PubMed summary error", {"error": str(e), "type": type(e).__name__})
+
+    debug_log("📦 PubMed summary cache", {"requested": len(pmids), "fetched": len(missing), **esummary_cache.stats()})
+    return {pmid: summary for pmid, summary in summaries.items() if summary}
+
+def fetch_pubmed_abstracts(pmids: List[str]) -> Dict[str, str]:
+    """Abstracts for a set of PMIDs, fetching every uncached one in a single efetch call"""
+    efetch_cache = get_literature_cache("efetch")
+    abstracts = {pmid: efetch_cache.get(pmid) for pmid in pmids}
+    missing = [pmid for pmid, abstract in abstracts.items() if abstract is None]
+
+    if missing:
+        try:
+            fetch_url = f"{PUBMED_EUTILS_URL}/efetch.fcgi"
+            fetch_params = {
+                "db": "pubmed",
+                "id": ",".join(missing),
+                "rettype": "abstract",
+                "retmode": "xml"
+            }
+            with metrics.track("pubmed_efetch"):
+                fetch_response = http_client.get(fetch_url, params=fetch_params, timeout=15)
+            if fetch_response.status_code != 200:
+                metrics.inc("medreel_stage_errors_total", stage="pubmed_efetch", error=f"http_{fetch_response.status_code}")
+                debug_log(f"❌ PubMed abstract fetch failed - Status: {fetch_response.status_code}")
+            else:
+                for article in ElementTree.fromstring(fetch_response.content).iter("PubmedArticle"):
+                    pmid = article.findtext("MedlineCitation/PMID", "")
+                    abstract = " ".join(
+                        "".join(part.itertext()).strip()
+                        for part in article.iterfind("MedlineCitation/Article/Abstract/AbstractText")
+                    )
+                    if pmid in abstracts:
+                        abstracts[pmid] = abstract
+                        efetch_cache.set(pmid, abstract)  # "" too: no abstract is a stable answer
+        except Exception as e:
+            debug_log("❌ PubMed abstract error", {"error": str(e), "type": type(e).__name__})
+
+    return {pmid: abstract for pmid, abstract in abstracts.items() if abstract}
+
+def fetch_pubmed_articles(pmids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Summaries plus abstracts for the union of PMIDs: one esummary and one efetch, run concurrently"""
+    pmids = list(dict.fromkeys(pmids))
+    if not pmids:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        summaries_future = executor.submit(worker_context(fetch_pubmed_summaries), pmids)
+        abstracts_future = executor.submit(worker_context(fetch_pubmed_abstracts), pmids)
+        summaries = summaries_future.result()
+        abstracts = abstracts_future.result()
+
+    return {
+        pmid: {**summary, "pmid": pmid, "abstract": abstracts.get(pmid, "")}
+        for pmid, summary in summaries.items()
+    }
+
+def fetch_pubmed_papers(query: str) -> List[Dict[str, Any]]:
+    """Fetch article summaries and abstracts for one PubMed query"""
+    pmids = search_pubmed_ids(query)
+    articles = fetch_pubmed_articles(pmids)
+    return [articles[pmid] for pmid in pmids if pmid in articles]
+
+def health_term_count(text: str) -> int:
+    """Distinct health terms in text, a cheap measure of how claim-dense it is"""
+    return len(HEALTH_TERMS.intersection(normalize_query(text).split()))
+
+def heuristic_claims(transcript: str) -> List[str]:
+    """Fallback claim finder: the word windows densest in health terms, in transcript order"""
+    words = transcript.split()
+    window = CLAIM_SEARCH_CONFIG["window_words"]
+    windows = [" ".join(words[i:i + window]) for i in range(0, len(words), window)]
+    scores = [health_term_count(text) for text in windows]
+    ranked = sorted(range(len(windows)), key=lambda i: -scores[i])[:CLAIM_SEARCH_CONFIG["max_claims"]]
+    best = sorted(i for i in ranked if scores[i])
+    return [windows[i] for i in best] or windows[:1]
+
+def extract_claims(caption: str, transcript: str) -> List[str]:
+    """Distinct health claims in the reel, rewritten as short English search queries"""
+    max_claims = CLAIM_SEARCH_CONFIG["max_claims"]
+    prompt = f"""Caption: {caption}
+
+Transcript: {transcript}
+
+List the distinct health or medical claims made in this Instagram Reel (at most {max_claims}). Rewrite each one as a short English literature search query of 3-8 words, without hashtags or emojis. Reply with JSON only: {{"claims": ["...", "..."]}}"""
+
+    try:
+        client, key_idx = get_groq_client()
+        try:
+            with metrics.track("claim_extraction"):
+                response = client.chat.completions.create(
+                    model=CLAIM_SEARCH_CONFIG["model"],
+                    messages=[
+                        {"role": "system", "content": "You extract checkable health claims from social media videos for a medical fact-checker."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0,
+                    max_tokens=256,
+                    response_format={"type": "json_object"}
+                )
+        except Exception as e:
+            GROQ_POOL.report_failure(key_idx, e)
+            raise
+        record_usage("claim_extraction", response.usage)
+        raw_claims = json.loads(response.choices[0].message.content or "{}").get("claims", [])
+    except Exception as e:
+        debug_log("❌ Claim extraction failed, using keyword fallback", {"error": str(e), "type": type(e).__name__})
+        raw_claims = []
+
+    # One query per distinct claim; normalize_query is what the caches key on anyway
+    claims, seen = [], set()
+    for claim in raw_claims:
+        if isinstance(claim, str) and normalize_query(claim) and normalize_query(claim) not in seen:
+            seen.add(normalize_query(claim))
+            claims.append(claim.strip())
+    claims = claims[:max_claims] or heuristic_claims(transcript or caption)
+    debug_log(f"🧾 Extracted {len(claims)} claims", {"claims": claims})
+    return claims
+
+def citation_keys(pmid: str = "", doi: str = "", title: str = "") -> set:
+    """Identifiers a paper may appear under in either source, for de-duplication"""
+    keys = {f"title:{normalize_query(title)}"} if title else set()
+    if pmid:
+        keys.add(f"pmid:{pmid}")
+    if doi:
+        keys.add(f"doi:{doi.lower()}")
+    return keys
+
+def fetch_medical_info(transcript: str, caption: str = "",
+                       degraded: Optional[List[str]] = None) -> Tuple[str, List[Dict[str, str]]]:
+    """Search PubMed and Semantic Scholar for every claim in the reel concurrently
+
+    If the search fails, the error stands in for the references and
+    "search" is appended to degraded.
+    """
+    citations = []
+
+    try:
+        claims = extract_claims(caption, transcript)
+        debug_log("🔍 Starting medical info search", {"claims": claims})
+
+        # Every claim hits both sources at once; the pool bounds the fan-out so
+        # latency stays close to one search until claims outnumber workers
+        max_workers = max(1, min(CLAIM_SEARCH_CONFIG["max_workers"], 2 * len(claims)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            esearch_futures = [executor.submit(worker_context(search_pubmed_ids), claim) for claim in claims]
+            semantic_futures = [executor.submit(worker_context(fetch_semantic_scholar_papers), claim) for claim in claims]
+            claim_pmids = [future.result() for future in esearch_futures]
+
+            # One esummary + one efetch for the PMIDs of every claim, not one per claim
+            articles = fetch_pubmed_articles([pmid for pmids in claim_pmids for pmid in pmids])
+            results = [
+                (claim, [articles[pmid] for pmid in pmids if pmid in articles], future.result())
+                for claim, pmids, future in zip(claims, claim_pmids, semantic_futures)
+            ]
+
+        seen: set = set()
+        sections = []
+        pubmed_count = semantic_count = 0
+        for n, (claim, pubmed_papers, semantic_papers) in enumerate(results, 1):
+            # PubMed evidence first, then Semantic Scholar
+            pubmed_results = []
+            for article in pubmed_papers:
+                title = article.get('title', '')
+                pmid = article['pmid']
+                if not title:
+                    continue
+                abstract = article.get('abstract', '')
+                snippet = f"\n  {abstract[:200]}{'...' if len(abstract) > 200 else ''}" if abstract else ""
+                pubmed_results.append(f"• {title}{snippet}")
+                doi = next((a.get('value', '') for a in article.get('articleids', []) if a.get('idtype') == 'doi'), "")
+                keys = citation_keys(pmid, doi, title)
+                if not keys & seen:
+                    seen |= keys
+                    pubmed_count += 1
+                    citations.append({
+                        "title": title,
+                        "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
+                        "source": "PubMed",
+                        "id": pmid,
+                        "year": (re.findall(r"\d{4}", article.get('pubdate', '')) or ["N/A"])[0],
+                        "claim": claim
+                    })
+                    debug_log(f"✅ Added PubMed citation: {title[:50]}...")
+
+            semantic_results = []
+            for paper in semantic_papers:
+                title = paper.get('title', '')
+                url = paper.get('url', '')
+                year = paper.get('year', 'N/A')
+                if not (title and url):
+                    continue
+                semantic_results.append(f"• {title} ({year})")
+                external_ids = paper.get('externalIds') or {}
+                keys = citation_keys(str(external_ids.get('PubMed', '')), external_ids.get('DOI', ''), title)
+                if not keys & seen:
+                    seen |= keys
+                    semantic_count += 1
+                    citations.append({
+                        "title": title,
+                        "url": url,
+                        "source": "Semantic Scholar",
+                        "year": str(year),
+                        "claim": claim
+                    })
+                    debug_log(f"✅ Added Semantic Scholar citation: {title[:50]}...")
+
+            evidence = pubmed_results[:2] + semantic_results[:2]
+            sections.append(f"Claim {n}: {claim}\n" + ("\n".join(evidence) if evidence else "• No references found"))
+
+        debug_log(f"📚 Total citations found: {len(citations)}", {
+            "claims": len(claims),
+            "pubmed": pubmed_count,
+            "semantic_scholar": semantic_count,
+            "total": len(citations)
+        })
+
+        result_text = "\n\n".join(sections) if citations else "No medical references found"
+        return result_text, citations
+
+    except Exception as e:
+        debug_log("❌ Medical search error", {"error": str(e), "type": type(e).__name__})
+        logger.error(f"Medical search error: {str(e)}")
+        if degraded is not None:
+            degraded.append("search")
+        return f"Medical search error: {str(e)}", citations
+
+def record_usage(stage: str, usage: Any) -> None:
+    """Count the prompt and completion tokens Groq reports for a request"""
+    if usage is None:
+        return
+    metrics.inc("medreel_llm_tokens_total", usage.prompt_tokens or 0, stage=stage, kind="prompt")
+    metrics.inc("medreel_llm_tokens_total", usage.completion_tokens or 0, stage=stage, kind="completion")
+    debug_log(f"🧮 {stage} token usage", {"prompt": usage.prompt_tokens, "completion": usage.completion_tokens})
+
+def stream_completion(stream: Any, on_token: Optional[Callable[[str], None]] = None, stage: str = "") -> str:
+    """Collect a streamed chat completion, passing the partial text to on_token as tokens arrive.
+
+    Groq reports usage on the last chunk; with a stage it's recorded in metrics.
+    """
+    parts = []
+    last_render = 0.0
+    for chunk in stream:
+        x_groq = getattr(chunk, "x_groq", None)
+        if stage and x_groq is not None and x_groq.usage is not None:
+            record_usage(stage, x_groq.usage)
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if not delta:
+            continue
+        parts.append(delta)
+        if on_token and time.monotonic() - last_render >= STREAM_RENDER_INTERVAL:
+            on_token("".join(parts))
+            last_render = time.monotonic()
+    return "".join(parts)
+
+ANALYSIS_SYSTEM_PROMPT = "You are a medical fact-checker who speaks like a Gen-Z doctor. Be accurate, funny, and use emojis. Write without markdown formatting."
+
+def analysis_prompt(caption: str, transcript: str, medical_context: str) -> str:
+    """The analysis request, with its fields filled in as given"""
+    return f"""You are a Gen-Z medical fact-checker with a sense of humor. Analyze this Instagram Reel content:
+
+**Caption:** {caption}
+
+**Transcript:** {transcript}
+
+**Scientific References Found:**
+{medical_context}
+
+Your task:
+1. **What's the claim?** - Summarize what they're saying (max 2 lines)
+2. **Is it legit?** ✅❌ - Rate accuracy (Accurate/Partially True/Misleading/False)
+3. **The tea ☕** - Explain what's actually true with scientific backing
+4. **Red flags 🚩** - Point out anything sus or incorrect
+5. **Bottom line** - Your verdict in one spicy sentence
+
+Keep it:
+- In bullet points
+- Easy to read
+- Funny but factual
+- Gen-Z friendly (use emojis!)
+- Backed by science
+
+IMPORTANT: Do NOT use ** for bold text. The system will handle formatting.
+
+Be brutally honest but helpful. If something's wrong, say it. If it's right, give credit."""
+
+def build_analysis_prompt(caption: str, transcript: str, medical_context: str) -> str:
+    """The analysis prompt, fitted to ANALYSIS_TOKEN_BUDGET with room left for the reply.
+
+    Caption and references are capped to their shares of the budget; the
+    transcript gets the rest. When it doesn't fit, its windows densest in
+    health terms and searched claim words are kept.
+    """
+    config = ANALYSIS_PROMPT_CONFIG
+    fixed = prompting.estimate_tokens(ANALYSIS_SYSTEM_PROMPT + analysis_prompt("", "", ""))
+    budget = max(0, config["budget"] - config["reply_tokens"] - fixed - 2 * prompting.MESSAGE_OVERHEAD_TOKENS)
+
+    caption = prompting.truncate_to_tokens(caption, int(budget * config["caption_share"]))
+    medical_context = prompting.truncate_to_tokens(medical_context, int(budget * config["references_share"]))
+
+    claim_terms = set(normalize_query(" ".join(re.findall(r"^Claim \d+: (.*)$", medical_context, re.M))).split())
+    claim_terms = {term for term in claim_terms if len(term) > 3}
+
+    def claim_density(window: str) -> float:
+        return health_term_count(window) + len(claim_terms.intersection(normalize_query(window).split()))
+
+    transcript_budget = budget - prompting.estimate_tokens(caption + medical_context)
+    fitted = prompting.select_spans(transcript, transcript_budget, claim_density, CLAIM_SEARCH_CONFIG["window_words"])
+    if fitted != transcript:
+        debug_log("✂️ Transcript trimmed to its most claim-dense spans", {
+            "transcript_tokens": prompting.estimate_tokens(transcript),
+            "kept_tokens": prompting.estimate_tokens(fitted)
+        })
+    return analysis_prompt(caption, fitted, medical_context)
+
+def analyze_with_llm(caption: str, transcript: str, medical_context: str, on_token: Optional[Callable[[str], None]] = None,
+                     degraded: Optional[List[str]] = None) -> str:
+    """Analyze content with Groq LLM and return the raw analysis text
+
+    An empty reply becomes a placeholder, and "analysis" is appended to degraded.
+    """
+    client, key_idx = get_groq_client()
+    logger.info(f"🤖 Using Groq API Key #{key_idx + 1}")
+
+    prompt = build_analysis_prompt(caption, transcript, medical_context)
+
+    debug_log("📤 Sending request to Groq LLM", {"prompt_length": len(prompt), "prompt_tokens": prompting.estimate_tokens(prompt)})
+
+    try:
+        with metrics.track("groq_analysis"):
+            stream = client.chat.completions.create(
+                model=ANALYSIS_PROMPT_CONFIG["model"],
+                messages=[
+                    {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],  # type: ignore
+                temperature=0.7,
+                max_tokens=ANALYSIS_PROMPT_CONFIG["reply_tokens"],
+                stream=True
+            )
+            result = stream_completion(stream, on_token, "groq_analysis")
+        if not result:
+            result = "Analysis not available"
+            if degraded is not None:
+                degraded.append("analysis")
+    except Exception as e:
+        GROQ_POOL.report_failure(key_idx, e)
+        raise
+
+    debug_log("✅ LLM analysis completed", {"length": len(result), "preview": result[:100]})
+    return result
+
+def summarize_chat(summary: str, messages: List[Dict[str, str]]) -> str:
+    """Fold older chat turns into the running summary with the small model"""
+    turns = "\n".join(f"{message['role']}: {prompting.strip_html(message['content'])}" for message in messages)
+    prompt = f"""Summary so far: {summary or "(none)"}
+
+New conversation turns:
+{turns}
+
+Update the summary of this conversation about an Instagram Reel's health claims. Keep the user's questions, the answers' conclusions and any sources or URLs mentioned. Reply with the summary only, in under {CHAT_CONTEXT_CONFIG["summary_tokens"] // 2} words."""
+
+    client, key_idx = get_groq_client()
+    try:
+        with metrics.track("chat_summary"):
+            response = client.chat.completions.create(
+                model=CHAT_CONTEXT_CONFIG["summary_model"],
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0,
+                max_tokens=CHAT_CONTEXT_CONFIG["summary_tokens"]
+            )
+    except Exception as e:
+        GROQ_POOL.report_failure(key_idx, e)
+        raise
+    record_usage("chat_summary", response.usage)
+    return (response.choices[0].message.content or "").strip()
+
+def fit_chat_history(chat_history: List[Dict[str, str]], memory: Optional[prompting.ChatMemory], budget: int) -> List[Dict[str, str]]:
+    """The turns not yet summarized, trimmed to fit in budget alongside the summary.
+
+    Older turns are folded into memory only once the unsummarized ones
+    reach fold_trigger times the budget, and then down to half the budget,
+    so the summary call happens every few questions rather than on every
+    one. In between, the longest turns are trimmed to make them fit.
+    """
+    start = memory.summarized if memory else 0
+    min_recent = CHAT_CONTEXT_CONFIG["min_recent_messages"]
+    reserved = CHAT_CONTEXT_CONFIG["summary_tokens"] if memory else 0
+    limit = budget - reserved
+
+    def recent_from(limit: int) -> int:
+        """Index of the oldest message that still fits in limit, counting back from the newest.
+
+        A message counts for no more than it could ever be sent with, its
+        min_recent share of the budget, so one very long answer doesn't
+        force a fold by itself.
+        """
+        used, cutoff = 0, len(chat_history)
+        while cutoff > start:
+            used += min(prompting.message_tokens(chat_history[cutoff - 1:cutoff]), budget // min_recent)
+            if used > limit and len(chat_history) - cutoff >= min_recent:
+                break
+            cutoff -= 1
+        return cutoff
+
+    cutoff = start
+    fold_limit = limit if memory is None else int(limit * CHAT_CONTEXT_CONFIG["fold_trigger"])
+    if recent_from(fold_limit) > start:
+        cutoff = recent_from(limit // 2)
+        if memory:
+            try:
+                memory.summary = summarize_chat(memory.summary, chat_history[start:cutoff])
+            except Exception as e:
+                debug_log("❌ Chat summary failed, dropping older turns", {"error": str(e), "type": type(e).__name__})
+            memory.summarized = cutoff
+        debug_log(f"🗜️ Folded {cutoff - start} older chat messages into the summary", {"summarized": cutoff})
+
+    return prompting.fit_messages(chat_history[cutoff:], limit)
+
+def chat_with_context(user_question: str, context: Dict[str, Any], citations: List[Dict[str, str]], chat_history: List[Dict[str, str]], on_token: Optional[Callable[[str], None]] = None, memory: Optional[prompting.ChatMemory] = None) -> str:
+    """Chat with context of the analyzed reel, keeping the prompt within CHAT_TOKEN_BUDGET tokens.
+
+    chat_history holds the earlier turns, not user_question. With a
+    ChatMemory, turns that no longer fit are summarized into it rather than
+    dropped.
+    """
+    client, key_idx = get_groq_client()
+    budget = CHAT_CONTEXT_CONFIG["budget"]
+
+    # Include citations in context, one short line each, as many as fit their share
+    citations_text = ""
+    if citations:
+        citations_budget = int(budget * CHAT_CONTEXT_CONFIG["citations_share"])
+        citations_text = "\n\nAvailable Scientific Sources:\n"
+        for i, cite in enumerate(citations, 1):
+            line = f"[{i}] {prompting.truncate_to_tokens(cite.get('title', ''), 30)} - {cite.get('source', '')} - {cite.get('url', '')}\n"
+            if prompting.estimate_tokens(citations_text + line) > citations_budget - 10:
+                citations_text += f"(and {len(citations) - i + 1} more)\n"
+                break
+            citations_text += line
+    user_question = prompting.truncate_to_tokens(user_question, int(budget * CHAT_CONTEXT_CONFIG["question_share"]))
+
+    analysis = prompting.truncate_to_tokens(
+        prompting.strip_html(context.get('analysis', 'N/A')),
+        int(budget * CHAT_CONTEXT_CONFIG["analysis_share"])
+    )
+    history = fit_chat_history(chat_history, memory, int(budget * CHAT_CONTEXT_CONFIG["history_share"]))
+    summary = prompting.truncate_to_tokens(memory.summary, CHAT_CONTEXT_CONFIG["summary_tokens"]) if memory else ""
+    summary_text = f"\n\nEarlier in this conversation: {summary}" if summary else ""
+    instructions = "Answer questions based on this context. Be friendly, accurate, and use emojis. When answering about sources or citations, ALWAYS provide the specific URLs from the citations above."
+
+    # Caption and transcript get whatever the rest of the prompt leaves over
+    skeleton = f"You are a helpful medical assistant. You have context about an Instagram Reel:\nReel Caption: \nTranscript: \nAnalysis: \n{instructions}"
+    used = (
+        prompting.estimate_tokens(skeleton + citations_text + analysis + summary_text)
+        + prompting.message_tokens(history + [{"role": "user", "content": user_question}])
+        + prompting.MESSAGE_OVERHEAD_TOKENS
+    )
+    remaining = max(0, budget - used)
+    caption = prompting.truncate_to_tokens(context.get('caption', 'N/A'), remaining // 4)
+    transcript = prompting.truncate_to_tokens(context.get('transcript', 'N/A'), remaining - prompting.estimate_tokens(caption))
+
+    context_info = f"""
+Reel Caption: {caption}
+Transcript: {transcript}
+Analysis: {analysis}{citations_text}{summary_text}
+"""
+
+    messages = [
+        {"role": "system", "content": f"You are a helpful medical assistant. You have context about an Instagram Reel:\n{context_info}\n{instructions}"}
+    ]
+    messages.extend(history)  # type: ignore
+    messages.append({"role": "user", "content": user_question})
+
+    debug_log("💬 Chat request", {
+        "question": user_question,
+        "prompt_tokens": prompting.message_tokens(messages),
+        "history_messages": len(history),
+        "summarized_messages": memory.summarized if memory else 0
+    })
+
+    try:
+        with metrics.track("groq_chat"):
+            stream = client.chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=messages,  # type: ignore
+                temperature=0.7,
+                max_tokens=CHAT_CONTEXT_CONFIG["reply_tokens"],
+                stream=True
+            )
+            result = stream_completion(stream, on_token, "groq_chat")
+    except Exception as e:
+        GROQ_POOL.report_failure(key_idx, e)
+        raise
+
+    debug_log("✅ Chat response received", {"length": len(result)})
+    return result
@@ -0,0 +1,127 @@
+"""Token estimation and trimming for the prompts sent to Groq.
+
+Counts are estimates: Groq doesn't expose the Llama tokenizer, and shipping
+one would be a heavy dependency for keeping prompts under a budget. Latin
+text averages about four characters per token. Devanagari and emoji split
+into far more tokens, so non-ASCII characters are weighted more heavily
+and Hindi transcripts aren't underestimated.
+"""
+import html
+import re
+from typing import Callable, Dict, List
+
+CHARS_PER_TOKEN = 4.0
+NON_ASCII_CHARS_PER_TOKEN = 1.5
+
+# Role markers and separators the chat template adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+ELLIPSIS = " …"
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate Llama token count for text"""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return int((len(text) - non_ascii) / CHARS_PER_TOKEN + non_ascii / NON_ASCII_CHARS_PER_TOKEN) + 1
+
+
+def message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Approximate prompt tokens for a list of chat messages"""
+    return sum(estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def strip_html(text: str) -> str:
+    """Plain text of an HTML fragment, with tags dropped and entities decoded"""
+    text = re.sub(r"<(br|/p|/div|/li|/h\d)\s*/?>", "\n", text, flags=re.I)
+    text = html.unescape(re.sub(r"<[^>]+>", "", text))
+    text = re.sub(r"[ \t]+", " ", text)
+    return re.sub(r"\n\s*\n+", "\n", text).strip()
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """The longest prefix of text, cut at a word boundary, that fits in budget tokens"""
+    if estimate_tokens(text) <= budget:
+        return text
+    if budget <= estimate_tokens(ELLIPSIS):
+        return ""
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid] + ELLIPSIS) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    cut = text[:low]
+    if " " in cut.strip():
+        cut = cut[:cut.rstrip().rfind(" ")]
+    return cut.rstrip() + ELLIPSIS
+
+
+def select_spans(text: str, budget: int, score: Callable[[str], float], window_words: int) -> str:
+    """The highest-scoring word windows of text that fit in budget tokens, in their original order.
+
+    Text that already fits is returned unchanged. Windows that tie keep
+    their transcript order, so the opening, where reels usually state their
+    claim, wins ties. Gaps between chosen windows are marked with an ellipsis.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    words = text.split()
+    windows = [" ".join(words[i:i + window_words]) for i in range(0, len(words), window_words)]
+    scores = [score(window) for window in windows]
+
+    chosen, used = [], 0
+    for i in sorted(range(len(windows)), key=lambda i: -scores[i]):
+        cost = estimate_tokens(windows[i]) + estimate_tokens(ELLIPSIS)
+        if used + cost <= budget:
+            chosen.append(i)
+            used += cost
+    if not chosen:
+        return truncate_to_tokens(text, budget)
+    chosen.sort()
+
+    parts = []
+    for position, i in enumerate(chosen):
+        if i > (chosen[position - 1] + 1 if position else 0):
+            parts.append(ELLIPSIS.strip())
+        parts.append(windows[i])
+    if chosen and chosen[-1] < len(windows) - 1:
+        parts.append(ELLIPSIS.strip())
+    return " ".join(parts)
+
+
+def fit_messages(messages: List[Dict[str, str]], budget: int) -> List[Dict[str, str]]:
+    """Messages trimmed to fit in budget tokens, cutting the longest ones first
+
+    Messages shorter than an even share are kept whole and what they leave
+    over goes to the rest, so a long answer is trimmed before a short question.
+    """
+    if message_tokens(messages) <= budget:
+        return messages
+    sizes = sorted(estimate_tokens(message["content"]) for message in messages)
+    remaining = budget - MESSAGE_OVERHEAD_TOKENS * len(messages)
+    share = 0
+    for n, size in enumerate(sizes):
+        share = max(0, remaining // (len(sizes) - n))
+        if size > share:
+            break
+        remaining -= size
+    return [
+        {"role": message["role"], "content": truncate_to_tokens(message["content"], share)}
+        for message in messages
+    ]
+
+
+class ChatMemory:
+    """Rolling summary of the chat turns too old to resend verbatim.
+
+    summarized counts the chat_history messages already folded into
+    summary. Later turns only ever add to it, so every older turn is
+    summarized exactly once.
+    """
+
+    def __init__(self):
+        self.summary = ""
+        self.summarized = 0
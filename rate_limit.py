@@ -0,0 +1,76 @@
+"""Token-bucket rate limiting shared by threads and by processes on one host."""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: buckets are shared by threads of one process only
+    fcntl = None  # type: ignore
+
+
+class TokenBucket:
+    """Allows rate requests per second on average, in bursts of up to burst.
+
+    With a state_path, the bucket lives in that file under an exclusive
+    lock, so every worker process pointed at the same file shares it.
+    Callers over the limit wait for a token rather than fail.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, state_path: Optional[str] = None):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.state_path = state_path if fcntl else None
+        self._lock = threading.Lock()
+        self._state_in_memory = {"tokens": self.burst, "updated": time.time()}
+        if self.state_path:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+
+    @contextmanager
+    def _state(self) -> Iterator[Dict[str, Any]]:
+        """The bucket state, locked against other threads and processes while in use"""
+        with self._lock:
+            if not self.state_path:
+                yield self._state_in_memory
+                return
+            with open(self.state_path, "a+", encoding="utf-8") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read())
+                    except ValueError:  # new (empty) file
+                        state = {"tokens": self.burst, "updated": time.time()}
+                    yield state
+                    f.truncate(0)
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _take(self) -> float:
+        """Take a token if one is available (0.0), else return the seconds until one will be"""
+        with self._state() as state:
+            now = time.time()  # wall clock, since processes share the state
+            tokens = min(self.burst, state["tokens"] + max(0.0, now - state["updated"]) * self.rate)
+            state["updated"] = now
+            if tokens >= 1:
+                state["tokens"] = tokens - 1
+                return 0.0
+            state["tokens"] = tokens
+            return (1 - tokens) / self.rate
+
+    def acquire(self) -> float:
+        """Block until a token is available; returns the seconds spent waiting (0.0 if none)"""
+        wait = self._take()
+        if not wait:
+            return 0.0
+        started = time.monotonic()
+        while wait:
+            time.sleep(wait)
+            wait = self._take()
+        return time.monotonic() - started
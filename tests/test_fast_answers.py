@@ -0,0 +1,52 @@
+from fast_answers import analysis_section, answer_verdict, question_intent
+
+NUMBERED = """1. What's the claim? - Lemon water burns belly fat
+2. Is it legit? ✅❌ - Misleading
+3. The tea ☕
+- Lemon water has no fat-burning effect
+4. Red flags 🚩
+- No sources
+5. Bottom line - Drink it because you like it, not to lose weight"""
+
+BULLETED = """* What’s the claim?
+• Lemon water burns belly fat
+* Is it legit? ✅❌
++ Misleading
+• The tea ☕
+- Lemon water has no fat-burning effect
+* Red flags 🚩
+- No sources
+* Bottom line
++ Drink it because you like it, not to lose weight"""
+
+
+def test_question_intent_accepts_curly_apostrophes():
+    assert question_intent("What’s the verdict?") == "verdict"
+    assert question_intent("What‘s the verdict?") == "verdict"
+    assert question_intent("What's the verdict?") == "verdict"
+    assert question_intent("What’s wrong with the verdict?") is None
+
+
+def test_numbered_sections():
+    assert analysis_section(NUMBERED, "is it legit") == "Misleading"
+    assert analysis_section(NUMBERED, "the tea") == "Lemon water has no fat-burning effect"
+    assert analysis_section(NUMBERED, "bottom line") == "Drink it because you like it, not to lose weight"
+
+
+def test_bulleted_headings_end_the_section():
+    assert analysis_section(BULLETED, "is it legit") == "Misleading"
+    assert analysis_section(BULLETED, "the tea") == "Lemon water has no fat-burning effect"
+    assert analysis_section(BULLETED, "bottom line") == "Drink it because you like it, not to lose weight"
+
+
+def test_missing_and_ambiguous_sections():
+    assert analysis_section(NUMBERED, "verdict") == ""
+    assert analysis_section(NUMBERED + "\n5. Bottom line - Actually fine", "bottom line") is None
+    assert analysis_section("2. Is it legit? ✅❌\n3. The tea ☕\n- It works", "is it legit") is None
+    assert answer_verdict({"analysis": NUMBERED + "\n* Bottom line\n- Again"}, []) is None
+
+
+def test_verdict_from_bulleted_analysis():
+    assert answer_verdict({"analysis": BULLETED}, []) == (
+        "⚖️ Rating: Misleading\n🎯 Bottom line: Drink it because you like it, not to lose weight"
+    )